@@ -0,0 +1,491 @@
+""" Microbenchmarks for the hot paths of the API extensions.
+
+    Runs against an in-memory SQLite database so results only depend on the code and the machine.
+
+    Usage:
+        python -m api.benchmark                            # Run every benchmark
+        python -m api.benchmark --only clean_html          # Run the benchmarks whose names start with clean_html
+        python -m api.benchmark --save baseline.json       # Save the results as a baseline
+        python -m api.benchmark --compare baseline.json    # Compare against a saved baseline
+        python -m api.benchmark --memory                   # Also measure the peak memory of list pages
+
+    When comparing, the command exits with status 1 if any benchmark is slower than the
+    baseline by more than --threshold (10% by default).
+
+    Memory benchmarks run once each in a forked process and report how much its peak resident
+    memory grew, so they only work where os.fork is available. They also report how many more
+    objects gc tracks afterwards and how many garbage collections of each generation ran.
+"""
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+from optparse import OptionParser
+import gc
+import os
+import platform
+import re
+from resource import getrusage, RUSAGE_SELF
+import sys
+import tempfile
+import timeit
+
+import simplejson
+
+
+BENCHMARKS = []
+MEMORY_BENCHMARKS = []
+
+BENCHMARK_SETTINGS = {
+    'DATABASES': {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+    'INSTALLED_APPS': ['django.contrib.auth', 'django.contrib.contenttypes'],
+    'BASE_API_URL': 'https://api.example.com',
+    'GET_LIMIT_MAX': 1000,
+    'DEBUG': False,
+}
+
+HTML_FRAGMENT = ("<p>We are looking for <b>two</b> volunteers to help <a href=\"/jobs/2/\" onclick=\"steal()\">"
+                 "sort donations</a>.</p><script>alert('hi');</script><ul><li><em>Saturday</em> mornings</li>"
+                 "<li><span style=\"color: red\">No experience needed</span></li></ul><iframe src=\"x\"></iframe>") * 4
+
+
+def benchmark(name):
+    """ Registers a benchmark. The decorated function does any setup and returns the
+        callable to be timed.
+    """
+    def decorator(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return decorator
+
+
+def memory_benchmark(name):
+    """ Registers a memory benchmark. The decorated function does any setup and returns the
+        callable whose peak memory is measured.
+    """
+    def decorator(setup):
+        MEMORY_BENCHMARKS.append((name, setup))
+        return setup
+    return decorator
+
+
+def setup_environment(num_users=500):
+    """ Configures Django with an in-memory SQLite database and fills it with data.
+
+        If DJANGO_SETTINGS_MODULE is set, those settings are used but the default database
+        is still swapped for an in-memory one. This has to happen before django.db is imported.
+    """
+    from django.conf import settings
+
+    if os.environ.get('DJANGO_SETTINGS_MODULE'):
+        settings.DATABASES = BENCHMARK_SETTINGS['DATABASES']
+    elif not settings.configured:
+        settings.configure(**BENCHMARK_SETTINGS)
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import transaction
+    call_command('syncdb', interactive=False, verbosity=0)
+
+    with transaction.commit_on_success():
+        for i in range(num_users):
+            User.objects.create(username='user{0}'.format(i), email='user{0}@example.com'.format(i))
+
+
+class SyntheticObject(object):
+    """ A plain object used in place of a model instance for dehydration benchmarks """
+    def __init__(self, id):
+        self.id = id
+        self.name = "Synthetic object <{0}>".format(id)
+        self.info = HTML_FRAGMENT
+        self.status = 'live'
+        self.rank = id * 7
+
+
+def get_synthetic_resource():
+    """ Returns an instance of a resource with a typical mix of fields that dehydrates
+        SyntheticObjects. Its request is a GET to its list endpoint.
+    """
+    from django.test.client import RequestFactory
+    from tastypie import fields
+    from api.resources.generic import BaseResource
+
+    class SyntheticResource(BaseResource):
+        id = fields.IntegerField(attribute='id')
+        name = fields.CharField(attribute='name')
+        info = fields.CharField(attribute='info')
+        status = fields.CharField(attribute='status')
+        rank = fields.IntegerField(attribute='rank')
+
+        def get_resource_uri(self, bundle):
+            return '/synthetic/{0}/'.format(bundle.obj.id)
+
+        class Meta(BaseResource.Meta):
+            resource_name = 'synthetic'
+            object_class = SyntheticObject
+
+    resource = SyntheticResource()
+    resource.request = RequestFactory().get('/synthetic/')
+    resource.request.user = None
+    return resource
+
+
+def get_list_data(num_objects=100):
+    """ Returns a dict shaped like a list response, with plain dicts as the objects """
+    objects = []
+    for i in range(num_objects):
+        objects.append({'id': i,
+                        'name': "Object {0}".format(i),
+                        'info': "<p>Some <b>info</b> about object {0}</p>".format(i),
+                        'resource_uri': 'https://api.example.com/synthetic/{0}/'.format(i),
+                        'time_created': '2012-06-01T12:30:00+00:00',
+                        'tags': ['a', 'b', 'c'],
+                        'organization': {'id': i % 10, 'name': "Organization {0}".format(i % 10)}})
+    return {'meta': {'limit': num_objects, 'offset': 0, 'total_count': num_objects * 10,
+                     'next': 'https://api.example.com/synthetic/?limit=100&offset=100', 'previous': None},
+            'objects': objects}
+
+
+@benchmark('clean_html')
+def bench_clean_html():
+    from api.utils import clean_html
+    return lambda: clean_html(HTML_FRAGMENT)
+
+
+@benchmark('clean_html_no_elements')
+def bench_clean_html_no_elements():
+    from api.utils import clean_html
+    return lambda: clean_html("Plain text with <b>one</b> tag & an ampersand", acceptable_elements=[])
+
+
+@benchmark('escape_fields')
+def bench_escape_fields():
+    resource = get_synthetic_resource()
+    data = get_list_data(1)['objects'][0]
+    return lambda: resource._escape_fields(dict(data))
+
+
+@benchmark('iso_datetime_field_clean')
+def bench_iso_datetime_field_clean():
+    from api.fields import ISODateTimeField
+    field = ISODateTimeField(required=False)
+    return lambda: field.clean('2012-06-01T12:30:00-05:00')
+
+
+@benchmark('list_field_clean')
+def bench_list_field_clean():
+    from api.fields import ListField
+    from api.forms import regex
+    field = ListField(max_length=5000, required=False, regex_string=regex)
+    value = '[id,name,resource_uri,time_created,time_last_updated,organization,organization_id,info]'
+    return lambda: field.clean(value)
+
+
+@benchmark('integer_list_field_clean')
+def bench_integer_list_field_clean():
+    from api.fields import IntegerListField
+    field = IntegerListField(max_length=5000, required=False)
+    value = '[{0}]'.format(', '.join([str(x) for x in range(100)]))
+    return lambda: field.clean(value)
+
+
+@benchmark('full_dehydrate_100')
+def bench_full_dehydrate():
+    resource = get_synthetic_resource()
+    objects = [SyntheticObject(i) for i in range(1, 101)]
+
+    def run():
+        for obj in objects:
+            resource.full_dehydrate(resource.build_bundle(obj=obj, request=resource.request))
+    return run
+
+
+@benchmark('full_dehydrate_100_list_bundles')
+def bench_full_dehydrate_list_bundles():
+    resource = get_synthetic_resource()
+    objects = [SyntheticObject(i) for i in range(1, 101)]
+
+    def run():
+        for obj in objects:
+            resource.full_dehydrate(resource._build_list_bundle(obj, resource.request))
+    return run
+
+
+@benchmark('bundle_build_200')
+def bench_bundle_build():
+    from tastypie.bundle import Bundle
+    objects = [SyntheticObject(i) for i in range(200)]
+    return lambda: [Bundle(obj=obj, request=None) for obj in objects]
+
+
+@benchmark('list_bundle_build_200')
+def bench_list_bundle_build():
+    from api.bundle import ListBundle
+    objects = [SyntheticObject(i) for i in range(200)]
+    return lambda: [ListBundle(obj=obj) for obj in objects]
+
+
+@benchmark('resource_construct')
+def bench_resource_construct():
+    resource_class = type(get_synthetic_resource())
+    return lambda: resource_class()
+
+
+@benchmark('resource_pooled')
+def bench_resource_pooled():
+    from api.pool import pooled_resource
+    resource_class = type(get_synthetic_resource())
+
+    def run():
+        with pooled_resource(resource_class) as resource:
+            resource.locally_accessed = True
+    return run
+
+
+@benchmark('paginator_page')
+def bench_paginator_page():
+    from django.contrib.auth.models import User
+    from api.paginator import BasePaginator
+    queryset = User.objects.all().order_by('id')
+
+    def run():
+        page = BasePaginator({'limit': 50, 'offset': 200}, queryset, resource_uri='/users/', limit=20).page()
+        list(page['objects'])
+    return run
+
+
+@benchmark('serializer_to_json_100')
+def bench_serializer_to_json():
+    from api.serializers import BaseSerializer
+    serializer = BaseSerializer(formats=['json'])
+    data = get_list_data(100)
+    return lambda: serializer.serialize(data, 'application/json')
+
+
+@benchmark('serializer_to_columnar_json_100')
+def bench_serializer_to_columnar_json():
+    from api.serializers import BaseSerializer
+    serializer = BaseSerializer(formats=['json'])
+    data = get_list_data(100)
+    return lambda: serializer.serialize(dict(data), 'application/json', {'layout': 'columnar'})
+
+
+def get_user_list_resource(stream_lists, num_users=2000):
+    """ Returns an instance of a model resource for Users, set up to handle a GET to its list
+        endpoint with get_list, and makes sure there are num_users users to list.
+
+        obj_get_list is replaced since Users can't be filtered with filter_view_perms. Everything
+        after it (sorting, pagination, dehydration and serialization) is the real list pipeline.
+    """
+    from django.contrib.auth.models import User
+    from django.test.client import RequestFactory
+    from tastypie import fields
+    from api.forms import BaseModelResourceListForm
+    from api.resources.generic import BaseModelResource
+
+    class UserListResource(BaseModelResource):
+        username = fields.CharField(attribute='username')
+        email = fields.CharField(attribute='email')
+        info = fields.CharField(attribute='last_name')
+
+        def get_resource_list_uri(self):
+            return '/users/'
+
+        def get_resource_uri(self, bundle):
+            return '/users/{0}/'.format(bundle.obj.id)
+
+        def obj_get_list(self, request, **kwargs):
+            return User.objects.all()
+
+        class Meta(BaseModelResource.Meta):
+            resource_name = 'users'
+            queryset = User.objects.all()
+            list_validation_form = BaseModelResourceListForm
+
+    UserListResource._meta.stream_lists = stream_lists
+
+    for i in range(User.objects.count(), num_users):
+        User.objects.create(username='user{0}'.format(i), email='user{0}@example.com'.format(i), last_name=HTML_FRAGMENT)
+
+    resource = UserListResource()
+    resource.locally_accessed = True # Lifts GET_LIMIT_MAX
+    request = RequestFactory().get('/users/', {'limit': num_users, 'order_by': '[id]'})
+    request.user = None
+    resource.request, resource.request_type, resource.method = request, 'list', 'GET'
+    return resource
+
+
+@memory_benchmark('list_page_materialized_2000')
+def memory_list_page_materialized():
+    """ A 2000 object page from get_list with Meta.stream_lists off """
+    resource = get_user_list_resource(stream_lists=False)
+    return lambda: resource.get_list(resource.request)
+
+
+@memory_benchmark('list_page_streamed_2000')
+def memory_list_page_streamed():
+    """ A 2000 object page from get_list with Meta.stream_lists on, so it goes through
+        _dehydrate_stream
+    """
+    resource = get_user_list_resource(stream_lists=True)
+    assert resource._can_stream_list()
+    return lambda: resource.get_list(resource.request)
+
+
+@memory_benchmark('bundles_100000')
+def memory_bundles():
+    """ 100000 tastypie Bundles kept alive at once. Each one makes an empty HttpRequest. """
+    from tastypie.bundle import Bundle
+    return lambda: [Bundle(obj=i) for i in xrange(100000)]
+
+
+@memory_benchmark('list_bundles_100000')
+def memory_list_bundles():
+    """ 100000 ListBundles kept alive at once """
+    from api.bundle import ListBundle
+    return lambda: [ListBundle(obj=i) for i in xrange(100000)]
+
+
+def time_benchmark(func, repeat=5, min_time=0.2):
+    """ Returns the best and mean time of one call to func in seconds.
+
+        The number of calls per repeat is doubled until a repeat takes at least min_time.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+
+    times = [x / number for x in timer.repeat(repeat=repeat, number=number)]
+    return {'best': min(times), 'mean': sum(times) / len(times), 'number': number}
+
+
+def run_benchmarks(only=None, repeat=5):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if only and not any(name.startswith(x) for x in only):
+            continue
+        results[name] = time_benchmark(setup(), repeat=repeat)
+        print "{0:<32} {1:>12.2f} us".format(name, results[name]['best'] * 1e6)
+    return results
+
+
+def measure_peak_memory(setup):
+    """ Runs setup and then the callable it returns once in a forked process. Returns a dict
+        of how much the process's peak resident memory grew while the callable ran in kilobytes
+        ('peak_kb'), how many more objects gc tracks afterwards ('gc_objects'), and the number
+        of collections of each generation that ran ('gc_collections').
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        func = setup()
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        before = getrusage(RUSAGE_SELF).ru_maxrss
+        with count_collections() as collections:
+            result = func()
+        after = getrusage(RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, simplejson.dumps({'peak_kb': after - before,
+                                             'gc_objects': len(gc.get_objects()) - objects_before,
+                                             'gc_collections': collections}))
+        del result
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = f.read()
+    os.waitpid(pid, 0)
+    return simplejson.loads(result)
+
+
+@contextmanager
+def count_collections():
+    """ Counts the garbage collections of each generation that run inside the block in the
+        list it yields.
+
+        Python 2 has no gc.callbacks, so the collector's gc.DEBUG_STATS messages are sent to a
+        temporary file instead of stderr and counted. Only use it in a forked process, since
+        nothing else can write to stderr while it runs.
+    """
+    collections = [0, 0, 0]
+    stats = tempfile.TemporaryFile()
+    stderr = os.dup(2)
+    sys.stderr.flush()
+    os.dup2(stats.fileno(), 2)
+    gc.set_debug(gc.DEBUG_STATS)
+    try:
+        yield collections
+    finally:
+        gc.set_debug(0)
+        os.dup2(stderr, 2)
+        os.close(stderr)
+        stats.seek(0)
+        for generation in re.findall(r'gc: collecting generation (\d)', stats.read()):
+            collections[int(generation)] += 1
+        stats.close()
+
+
+def run_memory_benchmarks(only=None):
+    results = {}
+    for name, setup in MEMORY_BENCHMARKS:
+        if only and not any(name.startswith(x) for x in only):
+            continue
+        results[name] = measure_peak_memory(setup)
+        print "{0:<32} {1:>12} KB {2:>12} objects   gc {3}".format(name, results[name]['peak_kb'], results[name]['gc_objects'],
+                                                                 '/'.join(str(x) for x in results[name]['gc_collections']))
+    return results
+
+
+def compare_results(baseline, results, threshold):
+    """ Prints how each result compares to the baseline and returns the names of the
+        benchmarks that got slower by more than threshold.
+    """
+    regressions = []
+    print
+    print "{0:<32} {1:>12} {2:>12} {3:>8}".format('benchmark', 'baseline us', 'current us', 'change')
+    for name in sorted(results):
+        if name not in baseline:
+            print "{0:<32} {1:>12} {2:>12.2f} {3:>8}".format(name, '-', results[name]['best'] * 1e6, 'new')
+            continue
+        old, new = baseline[name]['best'], results[name]['best']
+        change = (new - old) / old
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' SLOWER'
+        print "{0:<32} {1:>12.2f} {2:>12.2f} {3:>+7.1f}%{4}".format(name, old * 1e6, new * 1e6, change * 100, flag)
+    return regressions
+
+
+def main(argv=None):
+    parser = OptionParser(usage="python -m api.benchmark [options]")
+    parser.add_option('--only', action='append', help="Only run benchmarks whose names start with this. Can be repeated.")
+    parser.add_option('--repeat', type='int', default=5, help="The number of times each benchmark is repeated.")
+    parser.add_option('--save', help="Save the results as a JSON baseline to this file.")
+    parser.add_option('--compare', help="Compare the results against the JSON baseline in this file.")
+    parser.add_option('--threshold', type='float', default=0.1, help="The slowdown that counts as a regression when comparing.")
+    parser.add_option('--memory', action='store_true', help="Also run the memory benchmarks.")
+    options, args = parser.parse_args(argv)
+
+    setup_environment()
+    results = run_benchmarks(only=options.only, repeat=options.repeat)
+    memory_results = run_memory_benchmarks(only=options.only) if options.memory else {}
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            simplejson.dump({'python': platform.python_version(),
+                             'machine': platform.machine(),
+                             'results': results,
+                             'memory': memory_results}, f, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = simplejson.load(f)['results']
+        if compare_results(baseline, results, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+from __future__ import unicode_literals
+
+from tastypie.bundle import Bundle
+
+
+class ListBundle(Bundle):
+    """ A compact Bundle used while dehydrating lists and related resources, where thousands
+        of bundles can be made for one request.
+
+        Its attributes are kept in __slots__, so the instance __dict__ it inherits from Bundle
+        is only made if another attribute is set on it. It also doesn't make an empty
+        HttpRequest when no request is given.
+    """
+    __slots__ = ('obj', 'data', 'request', 'related_obj', 'related_name')
+
+    def __init__(self, obj=None, data=None, request=None, related_obj=None, related_name=None):
+        self.obj = obj
+        self.data = data or {}
+        self.request = request
+        self.related_obj = related_obj
+        self.related_name = related_name
+
+    def __repr__(self):
+        return "<ListBundle for obj: '{0}' and with data: '{1}'>".format(self.obj, self.data)
@@ -0,0 +1,143 @@
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.utils import simplejson
+
+
+def get_response_cache():
+    """ Returns the Django cache used for API responses, settings.API_RESPONSE_CACHE or 'default'.
+
+        The generations that invalidate cached responses are kept in it too, so it has to be
+        shared by every process (i.e. memcached) for a write in one process to invalidate the
+        responses cached by another. A locmem cache is only invalidated by its own process.
+    """
+    return get_cache(getattr(settings, 'API_RESPONSE_CACHE', 'default'))
+
+
+def normalize_query(query):
+    """ Returns a canonical string for a dict or QueryDict of query parameters. Only the order
+        of the keys is changed, so two queries have the same string only if a form would see
+        the same data.
+    """
+    return simplejson.dumps(query_items(query), cls=DjangoJSONEncoder)
+
+
+def query_items(query):
+    """ Returns a hashable tuple of the exact keys and values of a dict or QueryDict of query
+        parameters, with the keys sorted. Queries only have the same items if a form would see
+        the same data.
+    """
+    items = []
+    for key in sorted(query.keys()):
+        values = query.getlist(key) if hasattr(query, 'getlist') else [query[key]]
+        items.append((key, tuple([_hashable(x) for x in values])))
+    return tuple(items)
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return ('list', tuple([_hashable(x) for x in value]))
+    if isinstance(value, dict):
+        return ('dict', query_items(value))
+    return value
+
+
+def _generation_key(model):
+    return 'api:generation:{0}.{1}'.format(model._meta.app_label, model._meta.object_name.lower())
+
+
+def get_generation(model):
+    """ Returns the current generation of the cached responses for a model.
+
+        A new generation starts at the current time in milliseconds, so it is always higher than
+        one that was evicted from the cache, and responses cached under that one are never reused.
+    """
+    cache = get_response_cache()
+    key = _generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000))
+        generation = cache.get(key) or int(time.time() * 1000)
+    return generation
+
+
+def bump_generation(model):
+    """ Invalidates every cached response for a model by starting a new generation """
+    cache = get_response_cache()
+    try:
+        cache.incr(_generation_key(model))
+    except ValueError:
+        # The generation isn't in the cache yet, so starting one is enough
+        get_generation(model)
+
+
+def _invalidate(sender, **kwargs):
+    bump_generation(sender)
+
+
+def watch_model(model):
+    """ Bumps the generation for model whenever one of its objects is saved or deleted, which
+        happens whenever a TrackableObject is submitted, edited or removed. Only writes in
+        processes that have called this are seen. See api.resources.generic.watch_cached_resources
+    """
+    dispatch_uid = 'api_response_cache_{0}'.format(_generation_key(model))
+    post_save.connect(_invalidate, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_delete.connect(_invalidate, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+def get_response_cache_key(resource_name, models, format, query):
+    """ Returns the cache key for a response to a query on a resource whose data comes from
+        models. The key changes whenever the generation of one of the models does.
+    """
+    query_hash = hashlib.md5(normalize_query(query).encode('utf-8')).hexdigest()
+    generations = '.'.join([str(get_generation(model)) for model in models])
+    return 'api:response:{0}:{1}:{2}:{3}'.format(resource_name, generations, format, query_hash)
+
+
+def get_cached_response(key):
+    """ Returns the cached HttpResponse for key or None """
+    cached = get_response_cache().get(key)
+    if cached is None:
+        return None
+    response = HttpResponse(cached['content'], content_type=cached['content_type'], status=cached['status'])
+    response['X-Api-Cache'] = 'hit'
+    return response
+
+
+def cache_response(key, response, timeout):
+    get_response_cache().set(key, {'content': response.content,
+                                   'content_type': response['Content-Type'],
+                                   'status': response.status_code}, timeout)
+
+
+class LRUCache(object):
+    """ A thread safe in-process cache that keeps the max_size most recently used values """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._values.pop(key)
+            except KeyError:
+                return default
+            self._values[key] = value # Move it to the end as the most recently used
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._values.pop(key, None)
+            self._values[key] = value
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
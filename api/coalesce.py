@@ -0,0 +1,61 @@
+from __future__ import unicode_literals
+
+import threading
+
+from django.http import HttpResponse
+
+
+class _Call(object):
+    """ A call that is in flight. Waiting requests get its result once event is set. """
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+_calls = {}
+_lock = threading.Lock()
+
+
+def single_flight(key, func, timeout):
+    """ Calls func and returns its result, unless another thread is already calling func for
+        the same key. In that case, this waits for that call to finish and returns its result
+        instead. Calls are only shared between the threads of one process.
+
+        Returns a tuple of the result and whether it came from another thread's call. If the
+        other call raises an exception or takes longer than timeout seconds, func is called
+        again by this thread.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if leader:
+        try:
+            call.result = func()
+        except:
+            call.failed = True
+            raise
+        finally:
+            with _lock:
+                del _calls[key]
+            call.event.set()
+        return call.result, False
+
+    if call.event.wait(timeout) and not call.failed:
+        return call.result, True
+    return func(), False
+
+
+def copy_response(response, exclude_headers=()):
+    """ Returns a copy of an HttpResponse, so one response can be returned to several requests.
+        The headers in exclude_headers aren't copied.
+    """
+    exclude_headers = set(header.lower() for header in exclude_headers)
+    copy = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        if header.lower() not in exclude_headers:
+            copy[header] = value
+    return copy
@@ -10,16 +10,19 @@ from django import forms
 
 from tastypie import fields
 
+from api.pool import pooled_resource
 from timezones.zones import AMERICA_FIRST_TIMEZONE_CHOICES
 from trackable_object.models import TrackableObject
 
 
-def _dehydrate_related(bundle, related_resource, full=False):
+def _dehydrate_related(bundle, related_resource, full=False, fields=None):
     """
     Extends the default tastypie dehydrate_related to use our partial_dehydrate method
 
     Based on the ``full_resource``, returns either the endpoint or the data
     from ``full_dehydrate`` for the related resource.
+
+    If fields is given, only those fields of the related resource are dehydrated.
     """
     # Check to make sure we need to do anything
     if not related_resource.instance:
@@ -28,7 +31,10 @@ def _dehydrate_related(bundle, related_resource, full=False):
     # Give the related_resource a request object to use for the dehydrate cycle
     related_resource.request = bundle.request
 
-    bundle = related_resource.build_bundle(obj=related_resource.instance, request=bundle.request)
+    if fields:
+        related_resource.filter_fields(fields)
+
+    bundle = related_resource._build_list_bundle(related_resource.instance, bundle.request)
 
     if not full:
         # Add the id, resource_uri and name for the resource
@@ -40,8 +46,11 @@ def _dehydrate_related(bundle, related_resource, full=False):
 
 class BaseForeignKey(fields.ForeignKey):
     """ Tastypie Field for object foreign keys """
+    expand = False # Set by the resource for each request. If True, the full related resource is returned
+    nested_fields = None # Set by the resource for each request to the fields requested on the related resource
+
     def dehydrate_related(self, bundle, related_resource):
-        return _dehydrate_related(bundle, related_resource, self.full)
+        return _dehydrate_related(bundle, related_resource, self.full or self.expand, self.nested_fields)
 
     def resource_from_pk(self, fk_resource, obj, request=None, related_obj=None, related_name=None):
         fk_resource.request = request
@@ -50,12 +59,14 @@ class BaseForeignKey(fields.ForeignKey):
 
 class BaseRelatedField(fields.RelatedField):
     """ Custom field for adding related resources that aren't based solely on a Django foreignkey """
+    expand = False # Set by the resource for each request. If True, the full related resource is returned
+    nested_fields = None # Set by the resource for each request to the fields requested on the related resource
 
     def __init__(self, to, *args, **kwargs):
         return super(BaseRelatedField, self).__init__(to, None, *args, **kwargs)
 
     def dehydrate_related(self, bundle, related_resource):
-        return _dehydrate_related(bundle, related_resource, self.full)
+        return _dehydrate_related(bundle, related_resource, self.full or self.expand, self.nested_fields)
 
     def dehydrate(self, bundle):
         # Get the this field's name as specified in the resource
@@ -66,18 +77,18 @@ class BaseRelatedField(fields.RelatedField):
         method_name = "get_related_{0}".format(field_name)
 
         # Get the actual method from the resource
-        resource = self._resource()
-        method = resource.__getattribute__(method_name)
+        with pooled_resource(self._resource) as resource:
+            method = resource.__getattribute__(method_name)
 
-        # Get the related object
-        instance = method(bundle)
+            # Get the related object
+            instance = method(bundle)
 
         # Create the related resource
-        related_resource = self.to()
-        related_resource.instance = instance
+        with pooled_resource(self.to) as related_resource:
+            related_resource.instance = instance
 
-        # Dehydrate and return the related resource
-        return self.dehydrate_related(bundle, related_resource)
+            # Dehydrate and return the related resource
+            return self.dehydrate_related(bundle, related_resource)
 
 
 class ISODateTimeField(forms.RegexField):
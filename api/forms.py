@@ -5,10 +5,12 @@ from django import forms
 from tastypie.bundle import Bundle
 
 from django.conf import settings
-from api.fields import ListField
+from api.fields import ISODateTimeField, ListField
+from api.serializers import COLUMNAR_LAYOUT
 
 
 regex = '[a-z_0-9-]+'
+dotted_regex = '[a-z_0-9-]+(?:\.[a-z_0-9-]+)*' # A field name or a path to a field on a related resource
 
 class BaseForm(forms.Form):
     """ Extends Django's form class to add other useful things like a default value """
@@ -67,11 +69,15 @@ class BaseForm(forms.Form):
 
 
 class BaseModelResourceForm(BaseForm):
-    fields = ListField(max_length=5000, required=False, regex_string=regex)
+    fields = ListField(max_length=5000, required=False, regex_string=dotted_regex)
+    expand = ListField(max_length=5000, required=False, regex_string=regex)
 
 
 class BaseModelResourceListForm(BaseModelResourceForm):
     order_by = ListField(max_length=5000, required=False, regex_string=regex)
+    layout = forms.ChoiceField(choices=[(COLUMNAR_LAYOUT, COLUMNAR_LAYOUT)], required=False)
+    changed_since = ISODateTimeField(required=False)
+    cursor = forms.RegexField(regex='^\d{8}T\d{6}\.\d{6}_\d+$', max_length=100, required=False)
 
     def __init__(self, *args, **kwargs):
         visibilities = kwargs.pop('acceptable_visibilities', None)
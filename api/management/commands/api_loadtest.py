@@ -0,0 +1,268 @@
+""" Load tests the API with a synthetic dataset, from several processes at once.
+
+    Usage:
+        python manage.py api_loadtest                                  # 2000 requests from one worker per core
+        python manage.py api_loadtest --workers 8 --requests 20000     # More load
+        python manage.py api_loadtest --objects 100000 --info-size 5000
+        python manage.py api_loadtest --mix list=1,detail=1,post=0     # Only reads
+        python manage.py api_loadtest --save results.json              # Save the results
+
+    A test database is created from the project's settings, like the test runner does, so the
+    project's real data is never touched. SQLite test databases are put in a file so every
+    worker can open them. The dataset has --objects items, each with an HTML info blob and a
+    foreign key to one of --categories categories.
+
+    The synthetic models and resources are in api.tests.support. oauth2app's Authenticator is
+    replaced with one that accepts 'Bearer loadtest-<user id>', and each worker makes its
+    requests as one of the synthetic users through Django's test client. Each worker's
+    requests are timed after --warmup untimed ones.
+
+    The report has the throughput and the p50/p95/p99 latency of each endpoint. Throughput is
+    the number of timed requests divided by the time the slowest worker spent making them.
+"""
+from __future__ import unicode_literals
+
+from multiprocessing import Pool, cpu_count
+from optparse import make_option
+import math
+import os
+import random
+import tempfile
+import time
+
+import simplejson
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.client import Client
+
+from api.resources import generic
+from api.tests.support import (API_PREFIX, LoadTestCategory, LoadTestItem, LoadTestItemResource, StubAuthenticator,
+                               create_synthetic_tables, get_token, install_urls)
+from trackable_object.utils import fake_request
+
+
+ENDPOINTS = ['list', 'detail', 'post']
+
+HTML_PARAGRAPHS = [
+    "<p>We are looking for <b>{0}</b> volunteers to help <a href=\"/jobs/{0}/\" onclick=\"steal()\">sort donations</a>.</p>",
+    "<ul><li><em>Saturday</em> mornings</li><li><span style=\"color: red\">No experience needed</span></li></ul>",
+    "<script>alert('{0}');</script><p>Meet at the <i>north entrance</i> &amp; ask for the coordinator.</p>",
+    "<iframe src=\"http://example.com/{0}\"></iframe><p>Lunch is provided for shifts over <u>4 hours</u>.</p>",
+]
+
+
+class Command(BaseCommand):
+    help = "Load tests the API's list, detail and create endpoints with a synthetic dataset."
+    option_list = BaseCommand.option_list + (
+        make_option('--objects', type='int', default=5000, help="The number of items in the dataset."),
+        make_option('--categories', type='int', default=50, help="The number of categories the items belong to."),
+        make_option('--users', type='int', default=20, help="The number of users the requests are made as."),
+        make_option('--info-size', type='int', default=2000, help="The approximate size of each item's HTML info, in bytes."),
+        make_option('--workers', type='int', default=cpu_count(), help="The number of processes making requests."),
+        make_option('--requests', type='int', default=2000, help="The total number of timed requests."),
+        make_option('--warmup', type='int', default=10, help="The number of untimed requests each worker makes first."),
+        make_option('--limit', type='int', default=20, help="The page size of list requests."),
+        make_option('--mix', default='list=6,detail=3,post=1', help="The relative weight of each endpoint."),
+        make_option('--seed', type='int', default=0, help="Seeds the dataset and the request order."),
+        make_option('--save', help="Save the results as JSON to this file."),
+    )
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['workers'] < 1 or options['requests'] < 1 or options['objects'] < 1 or \
+           options['categories'] < 1 or options['users'] < 1:
+            raise CommandError("--workers, --requests, --objects, --categories and --users must be at least 1.")
+
+        verbosity = int(options.get('verbosity', 1))
+        settings.DEBUG = False # Otherwise every query is kept in memory
+        generic.Authenticator = StubAuthenticator
+        install_urls()
+
+        old_name = setup_database(verbosity)
+        try:
+            start = time.time()
+            user_ids, category_ids, item_ids = build_dataset(options['objects'], options['categories'], options['users'],
+                                                             options['info_size'], options['seed'])
+            if verbosity:
+                self.stdout.write("Created {0} items in {1:.1f}s\n".format(len(item_ids), time.time() - start))
+
+            config = {'mix': mix,
+                      'limit': options['limit'],
+                      'warmup': options['warmup'],
+                      'seed': options['seed'],
+                      'info_size': options['info_size'],
+                      'user_ids': user_ids,
+                      'category_ids': category_ids,
+                      'item_ids': item_ids}
+            results = run_load(options['workers'], options['requests'], config)
+        finally:
+            connection.creation.destroy_test_db(old_name, max(verbosity - 1, 0))
+
+        self.stdout.write(format_report(results))
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                simplejson.dump({'options': dict((key, options[key]) for key in ('objects', 'categories', 'users', 'info_size',
+                                                                                   'workers', 'requests', 'limit', 'mix')),
+                                 'results': results}, f, indent=2, sort_keys=True)
+
+
+def parse_mix(mix):
+    """ Parses 'list=6,detail=3,post=1' into a list of (endpoint, weight) tuples """
+    weights = []
+    try:
+        for part in mix.split(','):
+            endpoint, weight = part.split('=')
+            weights.append((endpoint.strip(), int(weight)))
+    except ValueError:
+        raise CommandError("--mix must look like list=6,detail=3,post=1.")
+    for endpoint, weight in weights:
+        if endpoint not in ENDPOINTS or weight < 0:
+            raise CommandError("--mix can only give list, detail and post a weight of 0 or more.")
+    if not sum([weight for endpoint, weight in weights]):
+        raise CommandError("--mix needs at least one endpoint with a weight above 0.")
+    return weights
+
+
+def setup_database(verbosity):
+    """ Creates the test database and the synthetic tables. Returns the name of the project's
+        database so it can be restored with destroy_test_db.
+    """
+    settings_dict = connection.settings_dict
+    old_name = settings_dict['NAME']
+    if settings_dict['ENGINE'].endswith('sqlite3') and settings_dict.get('TEST_NAME') in (None, '', ':memory:'):
+        # Every worker has to open the same database, so it can't be in memory
+        settings_dict['TEST_NAME'] = os.path.join(tempfile.mkdtemp(), 'api_loadtest.db')
+    connection.creation.create_test_db(verbosity=max(verbosity - 1, 0), autoclobber=True)
+    create_synthetic_tables()
+    return old_name
+
+
+def make_info(rng, size):
+    """ Returns an HTML blob of about size bytes, with markup that has to be cleaned """
+    paragraphs = []
+    length = 0
+    while length < size:
+        paragraph = rng.choice(HTML_PARAGRAPHS).format(rng.randint(1, 1000))
+        paragraphs.append(paragraph)
+        length += len(paragraph)
+    return ''.join(paragraphs)
+
+
+def build_dataset(num_objects, num_categories, num_users, info_size, seed, chunk_size=500):
+    """ Fills the test database. Objects are created with submit, like the API creates them.
+        Returns the ids of the users, categories and items.
+    """
+    rng = random.Random(seed)
+    with transaction.commit_on_success():
+        users = [User.objects.create(username='loadtest{0}'.format(i), email='loadtest{0}@example.com'.format(i))
+                 for i in range(num_users)]
+        requests = [fake_request(user=user, content_type='application/json', data='{}', method='POST') for user in users]
+        categories = [LoadTestCategory(name='Category {0}'.format(i)).submit(requests[i % num_users])
+                      for i in range(num_categories)]
+
+    item_ids = []
+    for chunk_start in range(0, num_objects, chunk_size):
+        with transaction.commit_on_success():
+            for i in range(chunk_start, min(chunk_start + chunk_size, num_objects)):
+                item = LoadTestItem(name='Item {0}'.format(i), info=make_info(rng, info_size), rank=rng.randint(0, 1000),
+                                    category=rng.choice(categories))
+                item_ids.append(item.submit(rng.choice(requests)).id)
+    return [x.id for x in users], [x.id for x in categories], item_ids
+
+
+def run_load(num_workers, num_requests, config):
+    """ Runs the requests in num_workers processes. Returns the results of format_results. """
+    counts = [num_requests // num_workers + (1 if i < num_requests % num_workers else 0) for i in range(num_workers)]
+    jobs = [(i, count, config) for i, count in enumerate(counts) if count]
+
+    connection.close() # Each worker opens its own connection
+    pool = Pool(len(jobs))
+    try:
+        worker_results = pool.map(run_worker, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    return format_results(worker_results)
+
+
+def run_worker(job):
+    """ Makes one worker's requests. Returns (elapsed seconds, [(endpoint, seconds, status code), ...]) """
+    worker_id, num_requests, config = job
+    connection.close() # Don't share a connection inherited from the parent
+
+    rng = random.Random(config['seed'] * 1000 + worker_id)
+    client = Client()
+    user_id = config['user_ids'][worker_id % len(config['user_ids'])]
+    auth = {'HTTP_AUTHORIZATION': get_token(user_id)}
+    endpoints = []
+    for endpoint, weight in config['mix']:
+        endpoints.extend([endpoint] * weight)
+
+    for i in range(config['warmup']):
+        make_request(client, rng.choice(endpoints), rng, auth, config)
+
+    samples = []
+    start = time.time()
+    for i in range(num_requests):
+        endpoint = rng.choice(endpoints)
+        request_start = time.time()
+        status_code = make_request(client, endpoint, rng, auth, config)
+        samples.append((endpoint, time.time() - request_start, status_code))
+    elapsed = time.time() - start
+    connection.close()
+    return elapsed, samples
+
+
+def make_request(client, endpoint, rng, auth, config):
+    """ Makes one request to endpoint and returns its status code """
+    list_path = '{0}{1}/'.format(API_PREFIX, LoadTestItemResource._meta.resource_name)
+    if endpoint == 'list':
+        max_offset = max(len(config['item_ids']) - config['limit'], 0)
+        response = client.get(list_path, {'limit': config['limit'], 'offset': rng.randint(0, max_offset)}, **auth)
+    elif endpoint == 'detail':
+        response = client.get('{0}{1}/'.format(list_path, rng.choice(config['item_ids'])), **auth)
+    else:
+        data = {'name': 'Posted item', 'info': make_info(rng, config['info_size']), 'rank': rng.randint(0, 1000),
+                'category_id': rng.choice(config['category_ids'])}
+        response = client.post(list_path, simplejson.dumps(data), content_type='application/json', **auth)
+    return response.status_code
+
+
+def percentile(sorted_values, fraction):
+    """ Returns the nearest-rank percentile of a sorted list """
+    index = int(math.ceil(fraction * len(sorted_values))) - 1
+    return sorted_values[max(index, 0)]
+
+
+def format_results(worker_results):
+    """ Returns a dict of the throughput and latency of each endpoint and of all of them together """
+    wall_time = max([elapsed for elapsed, samples in worker_results])
+    samples = [sample for elapsed, worker_samples in worker_results for sample in worker_samples]
+
+    results = {}
+    for endpoint in ENDPOINTS + ['total']:
+        endpoint_samples = [x for x in samples if endpoint in (x[0], 'total')]
+        if not endpoint_samples:
+            continue
+        durations = sorted([duration for name, duration, status_code in endpoint_samples])
+        results[endpoint] = {'requests': len(endpoint_samples),
+                             'errors': len([x for x in endpoint_samples if x[2] >= 400]),
+                             'requests_per_second': len(endpoint_samples) / wall_time if wall_time else 0,
+                             'p50_ms': percentile(durations, 0.5) * 1000,
+                             'p95_ms': percentile(durations, 0.95) * 1000,
+                             'p99_ms': percentile(durations, 0.99) * 1000}
+    return results
+
+
+def format_report(results):
+    lines = ["{0:<8} {1:>9} {2:>7} {3:>10} {4:>9} {5:>9} {6:>9}".format(
+        'endpoint', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms')]
+    for endpoint in ENDPOINTS + ['total']:
+        if endpoint in results:
+            result = results[endpoint]
+            lines.append("{0:<8} {1:>9} {2:>7} {3:>10.1f} {4:>9.2f} {5:>9.2f} {6:>9.2f}".format(
+                endpoint, result['requests'], result['errors'], result['requests_per_second'],
+                result['p50_ms'], result['p95_ms'], result['p99_ms']))
+    return '\n'.join(lines) + '\n'
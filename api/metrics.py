@@ -0,0 +1,288 @@
+from __future__ import unicode_literals
+
+import atexit
+import errno
+import fcntl
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import simplejson
+from tastypie.http import HttpForbidden
+
+
+logger = logging.getLogger(__name__)
+
+# The histograms kept for each (resource_name, request_type, method), with their help text and
+# the upper bounds of their buckets
+HISTOGRAMS = [
+    ('api_request_duration_seconds', "Time spent in dispatch",
+     (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+    ('api_response_bytes', "Size of the response body",
+     (100, 1000, 10000, 100000, 1000000, 10000000)),
+    ('api_response_objects', "Number of objects in the response",
+     (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)),
+    ('api_request_queries', "Number of SQL queries run",
+     (0, 1, 2, 5, 10, 20, 50, 100, 200)),
+]
+_buckets = dict((name, buckets) for name, help_text, buckets in HISTOGRAMS)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics_enabled():
+    return getattr(settings, 'API_METRICS', False)
+
+
+def get_metrics_dir():
+    """ Returns the directory each process saves its metrics in, settings.API_METRICS_DIR or
+        api_metrics in the temp directory. Every process serving the API has to use the same one.
+    """
+    return getattr(settings, 'API_METRICS_DIR', None) or os.path.join(tempfile.gettempdir(), 'api_metrics')
+
+
+RETIRED_FILE = 'retired.json' # The summed totals of processes that have exited
+
+
+class MetricsStore(object):
+    """ The histograms of one process. They are saved to <metrics dir>/<pid>-<start>.json at
+        most every settings.API_METRICS_FLUSH_INTERVAL seconds (10 by default) and when the
+        process exits, and render() adds up the files of every process.
+
+        Each file holds the totals since its process started, so adding them up gives the
+        totals of every process. A process started after a fork begins with empty histograms
+        and its own file. When render() finds the file of a process that has exited (its pid
+        isn't running, or a newer process has the same pid), the file is added to RETIRED_FILE
+        and removed, so the totals never go down when workers are restarted. A worker that is
+        killed without exiting cleanly loses the requests since its last flush.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self._flush_at_exit)
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.started = int(time.time() * 1000)
+        self.histograms = {} # Maps (name, resource_name, request_type, method) to [bucket counts, sum, count]
+        self.last_flush = time.time()
+        self.dirty = False
+
+    def observe(self, name, labels, value):
+        buckets = _buckets[name]
+        with self._lock:
+            if self.pid != os.getpid():
+                self._reset()
+            key = (name,) + tuple(labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0, 0]
+            for i, upper_bound in enumerate(buckets):
+                if value <= upper_bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+            self.dirty = True
+
+    def maybe_flush(self):
+        if self.dirty and time.time() - self.last_flush >= getattr(settings, 'API_METRICS_FLUSH_INTERVAL', 10):
+            try:
+                self.flush()
+            except (IOError, OSError), e:
+                logger.warning("Couldn't save the API metrics: {0}".format(e))
+
+    def flush(self):
+        """ Writes this process's histograms to its file """
+        with self._lock:
+            if self.pid != os.getpid():
+                self._reset()
+            totals = dict((key, [list(histogram[0]), histogram[1], histogram[2]])
+                          for key, histogram in self.histograms.items())
+            name = '{0}-{1}.json'.format(self.pid, self.started)
+            self.last_flush = time.time()
+            self.dirty = False
+
+        metrics_dir = get_metrics_dir()
+        if not os.path.isdir(metrics_dir):
+            try:
+                os.makedirs(metrics_dir)
+            except OSError:
+                pass # Another process made it first
+        _write_totals(os.path.join(metrics_dir, name), totals)
+
+    def render(self):
+        """ Returns the histograms of every process in the Prometheus text format """
+        self.flush()
+        metrics_dir = get_metrics_dir()
+        with open(os.path.join(metrics_dir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._retire_exited(metrics_dir)
+                totals = {}
+                for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+                    _add_totals(totals, _read_totals(path))
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        lines = []
+        for name, help_text, buckets in HISTOGRAMS:
+            keys = sorted(key for key in totals if key[0] == name)
+            if not keys:
+                continue
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} histogram'.format(name))
+            for key in keys:
+                counts, total_sum, total_count = totals[key]
+                labels = 'resource="{0}",request_type="{1}",method="{2}"'.format(*[_escape_label(x) for x in key[1:]])
+                cumulative = 0
+                for upper_bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append('{0}_bucket{{{1},le="{2}"}} {3}'.format(name, labels, upper_bound, cumulative))
+                lines.append('{0}_bucket{{{1},le="+Inf"}} {2}'.format(name, labels, total_count))
+                lines.append('{0}_sum{{{1}}} {2}'.format(name, labels, total_sum))
+                lines.append('{0}_count{{{1}}} {2}'.format(name, labels, total_count))
+        return '\n'.join(lines) + '\n'
+
+    def _retire_exited(self, metrics_dir):
+        """ Adds the files of processes that have exited to RETIRED_FILE and removes them.
+            Must be called with the metrics directory locked.
+        """
+        newest = {} # Maps each pid to the start time of its newest file
+        files = []
+        for path in glob.glob(os.path.join(metrics_dir, '*-*.json')):
+            try:
+                pid, started = [int(x) for x in os.path.basename(path)[:-len('.json')].split('-')]
+            except ValueError:
+                continue
+            files.append((path, pid, started))
+            newest[pid] = max(newest.get(pid, started), started)
+
+        exited = [path for path, pid, started in files if started < newest[pid] or not _is_running(pid)]
+        if not exited:
+            return
+        retired_path = os.path.join(metrics_dir, RETIRED_FILE)
+        totals = _read_totals(retired_path)
+        for path in exited:
+            _add_totals(totals, _read_totals(path))
+        _write_totals(retired_path, totals)
+        for path in exited:
+            os.remove(path)
+
+    def _flush_at_exit(self):
+        if self.dirty and self.pid == os.getpid():
+            try:
+                self.flush()
+            except (IOError, OSError):
+                pass
+
+metrics_store = MetricsStore()
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        return e.errno == errno.EPERM # It's running as another user
+    return True
+
+
+def _read_totals(path):
+    """ Returns the histograms saved in path as a dict, or an empty dict if it can't be read """
+    try:
+        with open(path) as f:
+            entries = simplejson.load(f)
+    except (IOError, ValueError):
+        return {}
+    return dict((tuple(entry['key']), [entry['buckets'], entry['sum'], entry['count']])
+                for entry in entries if entry['key'][0] in _buckets)
+
+
+def _add_totals(totals, other):
+    for key, (counts, total_sum, total_count) in other.items():
+        total = totals.setdefault(key, [[0] * len(_buckets[key[0]]), 0, 0])
+        for i, count in enumerate(counts[:len(total[0])]):
+            total[0][i] += count
+        total[1] += total_sum
+        total[2] += total_count
+
+
+def _write_totals(path, totals):
+    entries = [{'key': list(key), 'buckets': counts, 'sum': total_sum, 'count': total_count}
+               for key, (counts, total_sum, total_count) in totals.items()]
+    temp_path = '{0}.{1}.{2}.tmp'.format(path, os.getpid(), threading.current_thread().ident)
+    with open(temp_path, 'w') as f:
+        simplejson.dump(entries, f)
+    os.rename(temp_path, path) # Readers never see a partly written file
+
+
+def _escape_label(value):
+    return unicode(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class NullRequestMetrics(object):
+    """ Used in place of RequestMetrics when metrics are turned off """
+    def record(self, *args, **kwargs):
+        pass
+
+null_request_metrics = NullRequestMetrics()
+
+
+class RequestMetrics(object):
+    """ Measures one request and adds it to the process's histograms """
+    def __init__(self, query_log=None):
+        """ Args:
+                query_log - (optional) an active QueryLog that is counting this request's
+                            queries. Query counts are only recorded if one is given, since
+                            counting them turns on Django's debug cursor.
+        """
+        self.start = time.time()
+        self.query_log = query_log
+
+    def record(self, resource_name, request_type, method, response, object_count=None):
+        duration = time.time() - self.start
+        labels = (resource_name, request_type, method)
+        metrics_store.observe('api_request_duration_seconds', labels, duration)
+        if self.query_log is not None:
+            metrics_store.observe('api_request_queries', labels, self.query_log.count)
+        size = _get_response_size(response)
+        if size is not None:
+            metrics_store.observe('api_response_bytes', labels, size)
+        if object_count is not None:
+            metrics_store.observe('api_response_objects', labels, object_count)
+        metrics_store.maybe_flush()
+
+
+def _get_response_size(response):
+    if response.has_header('Content-Length'):
+        return int(response['Content-Length'])
+    if getattr(response, '_is_string', True):
+        return len(response.content)
+    return None # Reading an iterator's content would consume it
+
+
+def get_request_metrics(request, timer):
+    """ Returns a RequestMetrics if settings.API_METRICS is on, otherwise a NullRequestMetrics.
+        Queries are only counted when the timer has a QueryLog, i.e. when query debugging is on.
+    """
+    if not metrics_enabled():
+        return null_request_metrics
+    return RequestMetrics(getattr(timer, 'query_log', None))
+
+
+def metrics_view(request):
+    """ Returns the API metrics of every process in the Prometheus text format. Only staff and
+        settings.INTERNAL_IPS can see them.
+
+        Usage (in urls.py, before the API's own patterns):
+            url(r'^api/metrics/$', metrics_view)
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS and \
+       not getattr(getattr(request, 'user', None), 'is_staff', False):
+        return HttpForbidden()
+    return HttpResponse(metrics_store.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,20 @@
+""" The API has no models of its own. Django imports this module in every process that loads
+    the installed apps' models, so it is where the response cache starts watching the models
+    its cached responses come from. See watch_cached_resources.
+"""
+from django.conf import settings
+from django.utils.importlib import import_module
+
+from api.resources.generic import watch_cached_resources
+
+
+# The modules that define the API's resources
+RESOURCE_MODULES = getattr(settings, 'API_RESOURCE_MODULES', ['api.resources.jobs_resources',
+                                                              'api.resources.locations_resources',
+                                                              'api.resources.notifications_resources',
+                                                              'api.resources.payments_resources',
+                                                              'api.resources.user_resources'])
+
+for module_name in RESOURCE_MODULES:
+    import_module(module_name)
+watch_cached_resources()
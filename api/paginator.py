@@ -31,16 +31,38 @@ class BasePaginator(TastypiePaginator):
             return super(BasePaginator, self).get_count()
 
 class RenderedResourcePaginator(DefaultPaginator):
+    """ Paginates resources that were rendered with access_resource.
+
+        object_list is either the dict returned by access_resource, or an
+        api.utils.RenderedResourceList. A RenderedResourceList is rendered lazily,
+        so only the objects on the requested page are ever fetched.
+    """
     def page(self, number):
+        if hasattr(self.object_list, 'fetch_window'):
+            # Fetch the window for this page first. It also brings back the total count
+            # that validate_number needs, so each page only takes one request.
+            try:
+                requested_number = max(int(number), 1)
+            except (TypeError, ValueError):
+                requested_number = 1
+            bottom = self._get_bottom(requested_number)
+            self.object_list.fetch_window(bottom, self.get_current_per_page(requested_number) + self.orphans)
+
         number = self.validate_number(number)
-        bottom = 0 if number == 1 else ((number-2)*self.per_page + self.first_page)
+        bottom = self._get_bottom(number)
         top = bottom + self.get_current_per_page(number)
         if top + self.orphans >= self.count:
             top = self.count
 
+        if hasattr(self.object_list, 'fetch_window'):
+            return CustomPage(self.object_list[bottom:top], number, self)
+
         # Don't actually choose specific objects from the list, just keep track of the indicies
         return CustomPage(self.object_list, number, self)
 
+    def _get_bottom(self, number):
+        return 0 if number == 1 else ((number-2)*self.per_page + self.first_page)
+
     def _get_count(self):
         return self.object_list.get('meta').get('total_count')
 
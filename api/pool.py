@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+import threading
+
+
+MAX_IDLE_RESOURCES = 4 # The max number of idle instances kept per resource class and thread
+
+_local = threading.local()
+
+
+@contextmanager
+def pooled_resource(resource_class):
+    """ Lends out an instance of resource_class for in-process access, so resources don't have
+        to be constructed for every call.
+
+        Usage:
+            with pooled_resource(JobResource) as resource:
+                resource.full_dehydrate(bundle)
+
+        Instances are kept per thread. If every instance is in use (i.e. a resource is
+        accessed while it is dehydrating) a new one is created. When the block exits, the
+        attributes of the instance and of each of its fields are reset to what they were right
+        after it was constructed, since related fields keep per-request state such as
+        expand, nested_fields and the related resource they dehydrated with.
+    """
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = {}
+    idle = pool.setdefault(resource_class, [])
+
+    if idle:
+        resource, clean_state = idle.pop()
+    else:
+        resource = resource_class()
+        clean_state = _get_state(resource)
+
+    try:
+        yield resource
+    finally:
+        _restore_state(resource, clean_state)
+        if len(idle) < MAX_IDLE_RESOURCES:
+            idle.append((resource, clean_state))
+
+
+def _get_state(resource):
+    """ Returns a copy of the attributes of resource and of each of its fields """
+    fields = dict((name, (field, dict(field.__dict__))) for name, field in resource.fields.items())
+    return dict(resource.__dict__), fields
+
+
+def _restore_state(resource, state):
+    """ Resets resource and its fields to a state from _get_state """
+    attributes, fields = state
+    for field, field_attributes in fields.values():
+        field.__dict__.clear()
+        field.__dict__.update(field_attributes)
+    resource.__dict__.clear()
+    resource.__dict__.update(attributes)
+    resource.fields = dict((name, field) for name, (field, field_attributes) in fields.items())
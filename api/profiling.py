@@ -0,0 +1,149 @@
+from __future__ import unicode_literals
+
+import cProfile
+import gc
+import glob
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.utils import simplejson
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None # Not available on Windows
+
+
+# Staff users can profile a single request by sending this header
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+def get_profile_dir():
+    """ Returns the directory profiles are saved in, settings.API_PROFILE_DIR or api_profiles
+        in the temp directory
+    """
+    return getattr(settings, 'API_PROFILE_DIR', None) or os.path.join(tempfile.gettempdir(), 'api_profiles')
+
+
+def get_sampled_profiler():
+    """ Returns a started RequestProfiler for a random settings.API_PROFILE_SAMPLE_RATE share
+        of requests, or None. The rate is 0 by default, so nothing is profiled.
+    """
+    rate = getattr(settings, 'API_PROFILE_SAMPLE_RATE', 0)
+    if rate and random.random() < rate:
+        return RequestProfiler().start()
+    return None
+
+
+class RequestProfiler(object):
+    """ Profiles the CPU time of a request with cProfile, and its memory allocations with
+        tracemalloc if it is available, and saves them to the profile directory.
+
+        Each capture is a .prof file that can be loaded with pstats, and a .json file next to
+        it with the resource, request type, query string, timings, the top allocations and
+        'memory'. Since tracemalloc isn't in Python 2, 'memory' has how much the process's max
+        RSS grew (in the units of getrusage's ru_maxrss, KB on Linux), and the gc generation
+        counts and number of objects gc tracks before and after the request.
+        Only the newest settings.API_PROFILE_MAX_FILES (50 by default) captures are kept.
+    """
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.tracing_memory = False
+        self.snapshot = None
+        self.running = False
+
+    def start(self):
+        self.start_memory = self._get_memory_stats()
+        self.start_time = time.time()
+        self.start_cpu = sum(os.times()[:2])
+        if tracemalloc is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing_memory = True
+        self.running = True
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        """ Stops profiling. Safe to call more than once. """
+        if not self.running:
+            return
+        self.profile.disable()
+        self.running = False
+        self.duration = time.time() - self.start_time
+        self.cpu_time = sum(os.times()[:2]) - self.start_cpu
+        self.end_memory = self._get_memory_stats()
+        if self.tracing_memory:
+            self.snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self.tracing_memory = False
+
+    def save(self, request, response, resource_name, request_type):
+        """ Writes the capture to the profile directory and removes the oldest ones. Returns the
+            path of the .prof file.
+        """
+        self.stop()
+        profile_dir = get_profile_dir()
+        if not os.path.isdir(profile_dir):
+            os.makedirs(profile_dir)
+
+        name = '{0:d}-{1}-{2}-{3}'.format(int(self.start_time * 1000), os.getpid(), resource_name, request_type)
+        path = os.path.join(profile_dir, name)
+        self.profile.dump_stats(path + '.prof')
+
+        metadata = {'resource_name': resource_name,
+                    'request_type': request_type,
+                    'method': request.method,
+                    'path': request.path,
+                    'query_string': request.META.get('QUERY_STRING', ''),
+                    'status_code': response.status_code if response is not None else None,
+                    'time': self.start_time,
+                    'duration_ms': self.duration * 1000,
+                    'cpu_ms': self.cpu_time * 1000,
+                    'top_allocations': self._get_top_allocations(),
+                    'memory': self._get_memory_delta()}
+        with open(path + '.json', 'w') as f:
+            simplejson.dump(metadata, f, indent=2, sort_keys=True)
+
+        rotate_profiles(profile_dir, getattr(settings, 'API_PROFILE_MAX_FILES', 50))
+        return path + '.prof'
+
+    def _get_memory_stats(self):
+        """ Returns the process's max RSS (None if getrusage isn't available), the gc
+            generation counts and the number of objects gc tracks
+        """
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+        return {'max_rss': max_rss, 'gc_counts': list(gc.get_count()), 'objects': len(gc.get_objects())}
+
+    def _get_memory_delta(self):
+        start, end = self.start_memory, self.end_memory
+        max_rss_delta = end['max_rss'] - start['max_rss'] if start['max_rss'] is not None else None
+        return {'max_rss_delta': max_rss_delta,
+                'gc_counts_before': start['gc_counts'],
+                'gc_counts_after': end['gc_counts'],
+                'objects_before': start['objects'],
+                'objects_after': end['objects']}
+
+    def _get_top_allocations(self, limit=25):
+        if self.snapshot is None:
+            return None
+        return [{'location': unicode(stat.traceback), 'size': stat.size, 'count': stat.count}
+                for stat in self.snapshot.statistics('lineno')[:limit]]
+
+
+def rotate_profiles(profile_dir, max_files):
+    """ Removes the oldest captures in profile_dir so only max_files are left """
+    captures = sorted(glob.glob(os.path.join(profile_dir, '*.prof')))
+    for path in captures[:max(len(captures) - max_files, 0)]:
+        for capture_file in (path, path[:-len('.prof')] + '.json'):
+            try:
+                os.remove(capture_file)
+            except OSError:
+                pass # Another process removed it first
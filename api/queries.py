@@ -0,0 +1,183 @@
+from __future__ import unicode_literals
+
+from contextlib import contextmanager
+import logging
+import re
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+logger = logging.getLogger(__name__)
+
+# Staff users can ask for query counts on a single request by sending this header
+QUERY_DEBUG_HEADER = 'HTTP_X_QUERY_DEBUG'
+
+_literal_regex = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_list_regex = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+
+
+def normalize_sql(sql):
+    """ Replaces the literals in a SQL statement with placeholders so statements that only
+        differ by their parameters (i.e. one lookup per object) are grouped together.
+    """
+    sql = _literal_regex.sub('%s', sql)
+    sql = _in_list_regex.sub('(%s)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryLog(object):
+    """ Records the SQL queries run on one or more database connections while it is active.
+
+        Usage:
+            with QueryLog() as log:
+                resource.dispatch('list', request)
+            log.count, log.repeated()
+
+        Queries are captured with Django's debug cursor, so this works with DEBUG off.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        """ Args:
+                using - the alias of the database to record, or a list of aliases
+        """
+        aliases = [using] if isinstance(using, basestring) else using
+        self.connections = []
+        for alias in aliases:
+            if connections[alias] not in self.connections:
+                self.connections.append(connections[alias])
+        self.queries = None
+        self.active = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+        return False
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def count(self):
+        """ The number of queries run so far """
+        if self.queries is not None:
+            return len(self.queries)
+        return sum([len(connection.queries) - start_index
+                    for connection, start_index in zip(self.connections, self._start_indexes)])
+
+    def start(self):
+        self.queries = None
+        self.active = True
+        self._use_debug_cursors = [connection.use_debug_cursor for connection in self.connections]
+        for connection in self.connections:
+            connection.use_debug_cursor = True
+        self._start_indexes = [len(connection.queries) for connection in self.connections]
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        for connection, use_debug_cursor in zip(self.connections, self._use_debug_cursors):
+            connection.use_debug_cursor = use_debug_cursor
+        self.queries = self._get_queries()
+
+    def _get_queries(self):
+        queries = []
+        for connection, start_index in zip(self.connections, self._start_indexes):
+            queries.extend(connection.queries[start_index:])
+        return queries
+
+    def repeated(self, min_count=2):
+        """ Returns a list of (normalized sql, count) tuples for every statement that was run at
+            least min_count times, most repeated first.
+        """
+        queries = self.queries if self.queries is not None else self._get_queries()
+        counts = {}
+        for query in queries:
+            sql = normalize_sql(query['sql'])
+            counts[sql] = counts.get(sql, 0) + 1
+        repeats = [(sql, count) for sql, count in counts.items() if count >= min_count]
+        return sorted(repeats, key=lambda x: x[1], reverse=True)
+
+    def n_plus_one(self, object_count):
+        """ Returns the repeated statements that were run at least once per object, which
+            usually means a related object or hook is queried for each object on the page.
+        """
+        if not object_count or object_count < 2:
+            return []
+        return self.repeated(min_count=object_count)
+
+
+def get_query_log(request, using=DEFAULT_DB_ALIAS):
+    """ Returns an active QueryLog of the databases in using if query debugging is enabled for
+        this request, otherwise None.
+
+        Query debugging is enabled for every request with settings.API_QUERY_DEBUG, or for a
+        single request that a staff user sends with an X-Query-Debug header. Anyone else's
+        header is ignored, since the debug cursor and N+1 logging aren't free. The results
+        are only added to the response for staff users unless settings.API_QUERY_DEBUG is set.
+    """
+    if getattr(settings, 'API_QUERY_DEBUG', False) or \
+       QUERY_DEBUG_HEADER in request.META and getattr(getattr(request, 'user', None), 'is_staff', False):
+        query_log = QueryLog(using)
+        query_log.start()
+        return query_log
+    return None
+
+
+def add_query_headers(request, response, query_log, phase_counts, object_count=None):
+    """ Stops query_log, adds the query counts to the response and logs any N+1 patterns.
+
+        Headers:
+            X-Query-Count - The total number of queries
+            X-Query-Phases - The number of queries in each phase of the request
+            X-Query-Repeats - The number of statements that were repeated once per object
+    """
+    query_log.stop()
+    n_plus_one = query_log.n_plus_one(object_count)
+    for sql, count in n_plus_one:
+        logger.warning("Possible N+1 query in {0}: {1} queries for {2} objects: {3}".format(
+            request.path, count, object_count, sql))
+
+    if not getattr(settings, 'API_QUERY_DEBUG', False) and not getattr(request.user, 'is_staff', False):
+        return response
+
+    response['X-Query-Count'] = str(query_log.count)
+    response['X-Query-Phases'] = ', '.join(['{0}={1}'.format(name, count) for name, count in phase_counts])
+    response['X-Query-Repeats'] = str(len(n_plus_one))
+    return response
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS):
+    """ Fails if more than max_queries queries are run inside the block.
+
+        Usage in a resource test:
+            with assert_max_queries(5):
+                access_resource('jobs', request, params={'limit': 100})
+    """
+    query_log = QueryLog(using)
+    with query_log:
+        yield query_log
+
+    if query_log.count > max_queries:
+        repeats = '\n'.join(['  {0}x {1}'.format(count, sql) for sql, count in query_log.repeated()])
+        raise AssertionError("{0} queries were run, the max is {1}. Repeated queries:\n{2}".format(
+            query_log.count, max_queries, repeats or '  None'))
+
+
+def assert_list_queries(resource_class, request, max_queries, limit=100, params=None):
+    """ Fails if a GET to the list endpoint of resource_class with the given limit runs more than
+        max_queries queries. resource_class can be anything access_resource accepts.
+
+        Usage:
+            assert_list_queries('jobs', request, 8, limit=100)
+    """
+    from api.utils import access_resource
+
+    params = dict(params or {})
+    params['limit'] = limit
+    with assert_max_queries(max_queries):
+        access_resource(resource_class, request, params=params)
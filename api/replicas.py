@@ -0,0 +1,42 @@
+from __future__ import unicode_literals
+
+from django.conf import settings
+
+from api.cache import get_response_cache
+
+
+def get_stickiness():
+    """ Returns the number of seconds a user's reads stay on the primary database after they
+        write, settings.API_READ_STICKINESS or 5
+    """
+    return getattr(settings, 'API_READ_STICKINESS', 5)
+
+
+def _write_key(user):
+    return 'api:last_write:{0}'.format(user.id)
+
+
+def record_write(request):
+    """ Remembers that the user of request just wrote to the primary database, so their reads
+        aren't sent to a replica that may not have the write yet.
+
+        The time is kept in the API response cache, which has to be shared by every process
+        (i.e. memcached) for this to work across processes.
+    """
+    user = getattr(request, 'user', None)
+    stickiness = get_stickiness()
+    if user and user.is_authenticated() and stickiness > 0:
+        get_response_cache().set(_write_key(user), True, stickiness)
+
+
+def recently_wrote(request):
+    """ Returns True if the user of request wrote within the last get_stickiness() seconds.
+        The answer is kept on the request, so the cache is only read once per request.
+    """
+    if not hasattr(request, '_api_recently_wrote'):
+        user = getattr(request, 'user', None)
+        if not user or not user.is_authenticated() or get_stickiness() <= 0:
+            request._api_recently_wrote = False
+        else:
+            request._api_recently_wrote = bool(get_response_cache().get(_write_key(user)))
+    return request._api_recently_wrote
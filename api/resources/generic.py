@@ -1,57 +1,135 @@
 from __future__ import unicode_literals
 
 from simplejson.decoder import JSONDecodeError
+from contextlib import contextmanager
+import datetime
 import hashlib
 import inspect
+import logging
+import math
 import re
+import simplejson
 
 from django.conf import settings
 from django.conf.urls.defaults import *
 from django.contrib.auth.models import AnonymousUser
 from django.core import urlresolvers
-from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned, ValidationError
 from django.core.urlresolvers import reverse
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, transaction
 from django.db.models.fields import FieldDoesNotExist
-from django.db.models.query import Q
+from django.db.models.query import Q, QuerySet
 from django import forms
 from django.http import HttpResponse, Http404
+from django.utils.copycompat import deepcopy
+from django.utils.encoding import force_unicode
 from django.utils.html import escape as esc
 from django.views.decorators.csrf import csrf_exempt
 
 from tastypie import fields, http
 from tastypie.bundle import Bundle
 from tastypie.cache import NoCache
-from tastypie.exceptions import ImmediateHttpResponse, BadRequest
+from tastypie.exceptions import ApiFieldError, ImmediateHttpResponse, BadRequest
 from tastypie.http import HttpUnauthorized, HttpForbidden, HttpNotFound, HttpBadRequest
+from tastypie.utils import dict_strip_unicode_keys
 from tastypie.utils.mime import build_content_type
 from tastypie.resources import Resource, ModelResource, ModelDeclarativeMetaclass
 
+from api.bundle import ListBundle
 from api.fields import BaseForeignKey, BaseRelatedField
 from api.forms import BaseModelResourceForm, BaseModelResourceListForm
+from api.metrics import get_request_metrics, null_request_metrics
 from api.paginator import BasePaginator
-from api.serializers import BaseSerializer
+from api.pool import pooled_resource
+from api.profiling import PROFILE_HEADER, RequestProfiler, get_sampled_profiler
+from api.replicas import record_write, recently_wrote
+from api.serializers import BaseSerializer, DEFAULT_FORMATS
+from api.threads import thread_map
+from api.throttle import HttpTooManyRequests
+from api.timing import get_authenticated_timer, get_timer, null_timer
+from api.cache import LRUCache, cache_response, get_cached_response, get_response_cache_key, normalize_query, query_items, watch_model
+from api.coalesce import copy_response, single_flight
 from api.exceptions import Http410
 from api.utils import clean_html, isoformat
 from oauth2app.authenticate import Authenticator
 from oauth2app.models import AccessRange
 from trackable_object.exceptions import Http410
 
+logger = logging.getLogger(__name__)
+
 num_regex = '[0-9]+'
+CURSOR_TIME_FORMAT = '%Y%m%dT%H%M%S.%f' # The format of the change time in a sync cursor
+# Headers that describe a single request rather than the data in its response
+PER_REQUEST_HEADERS = ('X-RateLimit-Limit', 'X-RateLimit-Remaining', 'Retry-After', 'Server-Timing',
+                       'X-Query-Count', 'X-Query-Phases', 'X-Query-Repeats')
+
+# URI path templates for each (resource class, urlconf, url_name), resolved with reverse() the first time they're used
+_uri_templates = {}
+# The models whose changes invalidate each resource class's cached list responses. See _get_cache_models
+_cache_models = {}
+# The resource classes that cache their list responses. See watch_cached_resources
+_cached_resource_classes = []
+_validation_memo = LRUCache(getattr(settings, 'API_VALIDATION_MEMO_SIZE', 1000)) # See _validate_with_memo
+_uri_placeholder_id = 987654320 # Added to the position of each id to make placeholders that reverse() accepts
+
+
+def watch_cached_resources():
+    """ Connects the signals that invalidate cached list responses for the models of every
+        resource class with Meta.cache_anonymous_lists that has been defined, including the
+        models of their related resources.
+
+        api.models calls this once it has imported settings.API_RESOURCE_MODULES, so every
+        process that loads the installed apps' models (web workers, management commands, task
+        queues) invalidates the cache when it writes, even if it never serves a request.
+    """
+    for resource_class in list(_cached_resource_classes):
+        resource_class._get_cache_models()
+
+
+class _BulkRollback(Exception):
+    """ Raised inside a bulk write's transaction to roll it back """
+    pass
+
+
+# The errors that fail a single item of a bulk write instead of the whole request
+_BULK_ITEM_ERRORS = (ApiFieldError, ValidationError, ValueError, DatabaseError)
 
 
 class BaseModelDeclarativeMetaclass(ModelDeclarativeMetaclass):
     def __new__(cls, name, bases, attrs):
         """ Fix the default tastypie Resource Metaclass because it forgot to 
             initialize __bases__ which classes use to track their inheritance tree
+
+            Also adds any base fields from the parent classes that don't already exist
+            on the new resource. This is done once here instead of on every instantiation.
         """
         new_class = super(BaseModelDeclarativeMetaclass, cls).__new__(cls, name, bases, attrs)
         new_class.__bases__ = bases
+
+        # Invalidate the cached responses for this resource when its objects change. The
+        # models of its related resources are watched by watch_cached_resources, since they
+        # may not be importable yet.
+        if getattr(new_class._meta, 'cache_anonymous_lists', False) and new_class._meta.queryset is not None:
+            watch_model(new_class._meta.queryset.model)
+            _cached_resource_classes.append(new_class)
+
+        for parent in inspect.getmro(new_class):
+            if hasattr(parent, 'base_fields'):
+                base_fields = parent.base_fields
+                for key in base_fields:
+                    if not key in new_class.base_fields:
+                        new_class.base_fields[key] = base_fields[key]
         return new_class
 
 
 class BaseResource(Resource):
     locally_accessed = False # True if this resource is accessed from our Django module
                              # False if it was accessed normally (i.e. from an external request)
+    timer = null_timer # Times the phases of a request. Replaced by dispatch if timing is enabled
+    metrics = null_request_metrics # Adds the request to the API metrics. Replaced by dispatch if they are enabled
+    object_count = None # The number of objects returned by the current request
+    rate_limit_status = None # A (capacity, remaining, retry_after) tuple if the current request was throttled
+    profiler = None # A RequestProfiler if the current request is being profiled
 
     def __init__(self, *args, **kwargs):
         super(BaseResource, self).__init__(*args, **kwargs)
@@ -77,7 +155,18 @@ class BaseResource(Resource):
             if data.data.get('meta'):
                 data.data['meta'] = self._format_api_uri(request, data.data['meta'], api_uri_keys)
             self.bundle = data
-        return super(BaseResource, self).create_response(request, data, response_class, **response_kwargs)
+        response = super(BaseResource, self).create_response(request, data, response_class, **response_kwargs)
+        return self._add_rate_limit_headers(response)
+
+    def _add_rate_limit_headers(self, response):
+        """ Tells throttled clients how many requests they have left """
+        if self.rate_limit_status:
+            capacity, remaining, retry_after = self.rate_limit_status
+            response['X-RateLimit-Limit'] = capacity
+            response['X-RateLimit-Remaining'] = remaining
+            if response.status_code == HttpTooManyRequests.status_code:
+                response['Retry-After'] = int(math.ceil(retry_after))
+        return response
 
     def dehydrate(self, bundle):
         """ Uses the dehydrate hook to manipulate the data at the last possible moment
@@ -101,6 +190,18 @@ class BaseResource(Resource):
         bundle.data = self._escape_fields(data)
         return bundle
 
+    def wrap_view(self, view):
+        """ Overrides Resource's implementation so each request is handled by its own instance
+            of this resource, borrowed from api.pool. dispatch keeps the request's state on the
+            instance (request, bundle, timer, rate_limit_status, ...), so requests that threads
+            serve at the same time would otherwise overwrite each other's state.
+        """
+        @csrf_exempt
+        def wrapper(request, *args, **kwargs):
+            with pooled_resource(type(self)) as resource:
+                return super(BaseResource, resource).wrap_view(view)(request, *args, **kwargs)
+        return wrapper
+
     def dispatch(self, request_type, request, **kwargs):
         """ A thin wrapper around the Tastypie dispatch method that saves the request variables to the object 
         
@@ -113,11 +214,30 @@ class BaseResource(Resource):
         self.method = request.method.upper()
         self.request = request
         self.request_kwargs = kwargs.copy()
+        self.timer = get_timer(request, self._get_database_aliases())
+        self.metrics = get_request_metrics(request, self.timer)
+        self.object_count = None
+        self.rate_limit_status = None
+        self.profiler = get_sampled_profiler() # Staff can also turn it on in is_authenticated
         try:
-            return super(BaseResource, self).dispatch(request_type, request, **kwargs)
-        except JSONDecodeError:
-            # Raise a useful error message telling the user the JSON was malformed.
-            self.raise_error("The data passed in is not properly formatted JSON.", HttpBadRequest)
+            try:
+                response = super(BaseResource, self).dispatch(request_type, request, **kwargs)
+            except JSONDecodeError:
+                # Raise a useful error message telling the user the JSON was malformed.
+                self.raise_error("The data passed in is not properly formatted JSON.", HttpBadRequest)
+        except ImmediateHttpResponse, e:
+            self.timer.add_header(request, e.response, self.object_count)
+            self.metrics.record(self._meta.resource_name, request_type, self.method, e.response, self.object_count)
+            self._save_profile(request, e.response)
+            raise
+        finally:
+            self.timer.stop()
+            if self.profiler is not None:
+                self.profiler.stop()
+        response = self.timer.add_header(request, response, self.object_count)
+        self.metrics.record(self._meta.resource_name, request_type, self.method, response, self.object_count)
+        self._save_profile(request, response)
+        return response
 
     def do_if_authorized(self, object, action):
         """ Performs a TrackableObject action on an object if the user is authorized to do so
@@ -204,27 +324,30 @@ class BaseResource(Resource):
         return request.user
 
     def get_resource_list_uri(self):
-        return reverse('api_dispatch_list', kwargs={'resource_name': self._meta.resource_name}, urlconf='api.urls')
+        return self._get_uri_template('api_dispatch_list').format()
 
     def get_resource_uri(self, bundle):
-        return reverse('api_dispatch_detail', kwargs={'resource_name': self._meta.resource_name,
-                                                      'resource_id': bundle.obj.id}, urlconf='api.urls')
+        return self._get_uri_template('api_dispatch_detail', ['resource_id']).format(bundle.obj.id)
 
     def is_authenticated(self, request, **kwargs):
-        if request.user and request.user.is_authenticated():
-            # If the user is already logged in (i.e. if this is being accessed through views rather than HTTP)
-            pass
-        else:
-            scopes = self.get_acceptable_scopes(request)
-            authenticator = Authenticator(scope=scopes)
-            try:
-                authenticator.validate(request)
-                request.user = authenticator.user # Set the user to the owner of the access_token
-            except Exception, e:
-                if self.method == "GET":
-                    request.user = AnonymousUser()
-                else:
-                    self.raise_error(e.args[0], HttpUnauthorized)
+        with self.timer.phase('auth'):
+            if request.user and request.user.is_authenticated():
+                # If the user is already logged in (i.e. if this is being accessed through views rather than HTTP)
+                pass
+            else:
+                scopes = self.get_acceptable_scopes(request)
+                authenticator = Authenticator(scope=scopes)
+                try:
+                    authenticator.validate(request)
+                    request.user = authenticator.user # Set the user to the owner of the access_token
+                except Exception, e:
+                    if self.method == "GET":
+                        request.user = AnonymousUser()
+                    else:
+                        self.raise_error(e.args[0], HttpUnauthorized)
+        self.timer = get_authenticated_timer(self.timer, request, self._get_database_aliases())
+        if PROFILE_HEADER in request.META and self.profiler is None and getattr(request.user, 'is_staff', False):
+            self.profiler = RequestProfiler().start()
         return True
 
     def is_authorized(self, request, object=None):
@@ -273,7 +396,23 @@ class BaseResource(Resource):
             self.create_response(self.request, {'error_message': response_message}, response_class)
         )
 
+    def serialize(self, request, data, format, options=None):
+        """ Passes the layout requested with ?layout= on to the serializer """
+        options = options or {}
+        if request and request.GET.get('layout'):
+            options['layout'] = request.GET['layout']
+        with self.timer.phase('serialize'):
+            return super(BaseResource, self).serialize(request, data, format, options)
+
     # Private methods
+    def _build_list_bundle(self, obj, request):
+        """ Returns a compact ListBundle for dehydrating obj as part of a list or as a related
+            resource. If build_bundle is overridden, it is used instead.
+        """
+        if type(self).build_bundle.im_func is not Resource.build_bundle.im_func:
+            return self.build_bundle(obj=obj, request=request)
+        return ListBundle(obj=obj, request=request)
+
     def _format_uri(self, request, object_data, keys, base_url):
         """ Does a majority of the work in implementing _format_api_uri
         
@@ -290,21 +429,47 @@ class BaseResource(Resource):
 
     def _format_api_uri(self, request, object_data, keys):
         # Add any uris to the list of keys by finding ones that end with _uri
-        keys += [x for x in object_data if x.endswith('_uri') and x not in keys]
+        keys = keys + [x for x in object_data if x.endswith('_uri') and x not in keys]
         return self._format_uri(request, object_data, keys, settings.BASE_API_URL)
 
+    def _get_uri_template(self, url_name, id_kwargs=None):
+        """ Returns the path of one of this resource's URLs in Meta.urlconf, with {0}, {1}, ... in
+            place of the resource ids so it can be filled in with str.format. _format_api_uri adds
+            the host.
+
+            It is resolved with reverse() the first time it is used and then reused.
+
+            Args:
+                url_name - the name of the URL, i.e. 'api_dispatch_detail'
+                id_kwargs - (optional) a list of the names of the URL's id arguments, in the order
+                            they will be passed to format
+        """
+        id_kwargs = id_kwargs or []
+        key = (type(self), self._meta.urlconf, url_name)
+        template = _uri_templates.get(key)
+        if template is None:
+            kwargs = {'resource_name': self._meta.resource_name}
+            for position, id_kwarg in enumerate(id_kwargs):
+                kwargs[id_kwarg] = _uri_placeholder_id + position
+            path = reverse(url_name, kwargs=kwargs, urlconf=self._meta.urlconf)
+
+            template = path.replace('{', '{{').replace('}', '}}')
+            for position in range(len(id_kwargs)):
+                template = template.replace(str(_uri_placeholder_id + position), "{%d}" % position)
+            _uri_templates[key] = template
+        return template
+
     def _format_id_fields(self, object_data):
         """ Adds an id field to a related object in object_data and then returns the updated object
 
             args - 
                 ojbect_data - a dictionary of data that needs to be formatted.
         """
-        for key in object_data.keys():
-            if isinstance(object_data[key], Bundle):
+        for key, value in object_data.items():
+            if isinstance(value, Bundle):
                 id_field_name = "{0}_id".format(key)
-                object_data[id_field_name] = object_data[key].data.get('id', None)
-            elif isinstance(self.fields.get(key), BaseForeignKey) or \
-                 isinstance(self.fields.get(key), BaseRelatedField):
+                object_data[id_field_name] = value.data.get('id', None)
+            elif isinstance(self.fields.get(key), (BaseForeignKey, BaseRelatedField)):
                 # If this field is a pointer to another resource but is None,
                 # still add None to the id field so the attribute exists
                 id_field_name = "{0}_id".format(key)
@@ -328,6 +493,25 @@ class BaseResource(Resource):
                 object_data[key] = clean_html(object_data[key], acceptable_elements=[])
         return object_data
 
+    def _get_database_aliases(self):
+        """ Returns the aliases of the databases this resource's requests can query """
+        read_db_alias = getattr(self._meta, 'read_db_alias', None)
+        if read_db_alias and read_db_alias != DEFAULT_DB_ALIAS:
+            return [DEFAULT_DB_ALIAS, read_db_alias]
+        return [DEFAULT_DB_ALIAS]
+
+    def _save_profile(self, request, response):
+        """ Saves the current request's profile, if it is being profiled. A profile that can't be
+            written is logged instead of failing the request.
+        """
+        if self.profiler is None:
+            return
+        profiler, self.profiler = self.profiler, None
+        try:
+            profiler.save(request, response, self._meta.resource_name, self.request_type)
+        except (IOError, OSError), e:
+            logger.warning("Couldn't save the profile of {0}: {1}".format(request.get_full_path(), e))
+
     class Meta:
         fields = ['id'] # Disable all model fields so we can add/manipulate them manually
         always_return_data = True
@@ -338,9 +522,10 @@ class BaseResource(Resource):
         paginator_class = BasePaginator
         limit = 100
         max_limit = 200
-        serializer = BaseSerializer(formats=['json'])
+        serializer = BaseSerializer(formats=DEFAULT_FORMATS)
         list_allowed_methods = ['get', 'post']
         api_uri_keys = ['resource_uri', 'next', 'previous']
+        urlconf = 'api.urls' # The URLconf that get_resource_uri and get_resource_list_uri reverse from
         dont_escape = [] # A list of fields that should not be run through the resource's escape method
         num_resource_ids = 1 # The number of resource ids that will be passed in as parameters.
                              # Only 1 or 2 are valid choices for this parameter
@@ -351,18 +536,32 @@ class BaseModelResource(BaseResource, ModelResource):
 
     __metaclass__ = BaseModelDeclarativeMetaclass
 
-    def __init__(self, *args, **kwargs):
-        # Loop over all parent classes to add any base fields that don't already
-        # exist on the current resource
-        parent_classes = inspect.getmro(self.__class__)
-        for parent in parent_classes:
-            if hasattr(parent, 'base_fields'):
-                base_fields = parent.base_fields
-                for key in base_fields:
-                    if not key in self.base_fields:
-                        self.base_fields[key] = base_fields[key]
+    def apply_authorization_limits(self, request, object_list):
+        """ Throttles how often each user can get this resource's list, unless get_list already
+            did before it looked for a cached response. See _check_rate_limit.
+        """
+        if self.rate_limit_status is None:
+            self._check_rate_limit(request)
+        return object_list
+
+    def _check_rate_limit(self, request):
+        """ Throttles how often each user can get this resource's list with Meta.rate_limit.
+            Requests with limit=0 that only count objects use Meta.count_rate_limit instead if
+            it is set, so they can have a cheaper budget.
 
-        super(BaseModelResource, self).__init__(*args, **kwargs)
+            Throttled requests get a 429 response with a Retry-After header.
+        """
+        rate_limit, bucket = self._meta.rate_limit, 'list'
+        if request.GET.get('limit') == '0' and self._meta.count_rate_limit:
+            rate_limit, bucket = self._meta.count_rate_limit, 'count'
+
+        if rate_limit and not self.locally_accessed:
+            key = '{0}:{1}:{2}'.format(self._meta.resource_name, bucket, self._get_throttle_identity(request))
+            allowed, remaining, retry_after = rate_limit.consume(key)
+            self.rate_limit_status = (rate_limit.capacity, remaining, retry_after)
+            if not allowed:
+                self.raise_error("Too many requests. Try again in {0} seconds.".format(int(math.ceil(retry_after))),
+                                 HttpTooManyRequests)
 
     def alter_queryset(self, queryset, filters=None):
         """ Gets called after the filters are built but before a list of resources is looked up.
@@ -475,37 +674,84 @@ class BaseModelResource(BaseResource, ModelResource):
             return isoformat(bundle.obj.action_time)
         return isoformat(bundle.obj.submitted_time)
 
-    def filter_fields(self, fields):
+    def export_ndjson(self, request, stream, after_pk=None, chunk_size=None):
+        """ Writes every object in the list for request that its user can see to stream, one
+            dehydrated object per line, in primary key order.
+
+            Objects are fetched chunk_size at a time (Meta.export_chunk_size by default) with
+            a query that starts after the last pk written, so memory use doesn't grow with the
+            size of the list and an export can be resumed by passing the last pk as after_pk.
+
+            Returns the pk of the last object written, or after_pk if nothing was written.
+            See api.utils.export_resource.
+        """
+        self.request_type = 'list'
+        self.method = 'GET'
+        self.request = request
+        self.request_kwargs = {}
+        self.bundle = Bundle(data=request.GET.copy())
+        self.bundle.queryset = None
+        self.is_valid(bundle=self.bundle, request=request)
+        self.filter_fields(self.bundle.data.get('fields', None), expand=self.bundle.data.get('expand', None))
+
+        queryset = self.obj_get_list(request=request).order_by('pk')
+        chunk_size = chunk_size or self._meta.export_chunk_size
+        while True:
+            chunk = queryset.filter(pk__gt=after_pk) if after_pk is not None else queryset
+            objects = list(chunk[:chunk_size])
+            for obj in objects:
+                bundle = self.cached_full_dehydrate(self._build_list_bundle(obj, request))
+                stream.write(self._meta.serializer.to_json(bundle) + '\n')
+                after_pk = obj.pk
+            if len(objects) < chunk_size:
+                return after_pk
+
+    def filter_fields(self, fields, expand=None):
         """ Takes in a list of fields and removes all fields on the resource except for the fields
             specified in the list. If fields is None or empty, this does nothing
+
+            Fields of related resources can be chosen with dotted names, i.e. 'organization.name'.
+            The related resources named in expand, or in a dotted field name, are returned in full
+            instead of as a partial resource.
         """
         self.ignore_fields = []
+        self.expand_fields = {} # Maps the related fields to expand to the fields requested on them
+
+        # Split the dotted field names into the top level field and the fields for the related resource
+        top_level_fields = []
+        nested_fields = {}
+        for field in fields or []:
+            name, dot, nested = field.partition('.')
+            if name not in top_level_fields:
+                top_level_fields.append(name)
+            if nested:
+                nested_fields.setdefault(name, []).append(nested)
+
+        related_fields = self._get_related_fields()
+        for name in list(expand or []) + nested_fields.keys():
+            if name not in related_fields:
+                response_message = "Field '{0}' is not a related resource and cannot be expanded.".format(name)
+                self.raise_error(response_message, http.HttpBadRequest)
+            self.expand_fields[name] = nested_fields.get(name)
+            if fields and name not in top_level_fields:
+                top_level_fields.append(name)
+
         if fields:
             # Specify any fields that must show up no matter what 
             permanent_fields = ['resource_uri']
 
-            # Create the valid id field names
-            id_fields = []
-            for declared_field_name, declared_field_object in self.declared_fields.items() + self.fields.items():
-                if isinstance(declared_field_object, BaseForeignKey):
-                    id_fields.append("{0}_id".format(declared_field_name))
-
-            # Specify fields defined on the resource
-            initial_fields = self.fields.keys() + self.declared_fields.keys() + self.Meta.fields + id_fields
-
-            # Make a list of all valid fields
-            valid_fields = initial_fields + permanent_fields
+            initial_fields, valid_fields = self._get_valid_fields()
 
             # Check that all the fields live on the resource
-            for field in fields:
-                if field not in valid_fields:
-                    response_message = "Field '{0}' is not a valid field.".format(field)
-                    response_class = http.HttpBadRequest
-                    self.raise_error(response_message, response_class)
+            invalid_field = self._find_invalid_field(fields)
+            if invalid_field:
+                response_message = "Field '{0}' is not a valid field.".format(invalid_field)
+                response_class = http.HttpBadRequest
+                self.raise_error(response_message, response_class)
 
             # Remove the fields from the resource
             for field in initial_fields:
-                if field not in fields and \
+                if field not in top_level_fields and \
                    field not in permanent_fields:
                     self.ignore_fields.append(field)
 
@@ -536,6 +782,11 @@ class BaseModelResource(BaseResource, ModelResource):
                 field_object.api_name = self._meta.api_name
                 field_object.resource_name = self._meta.resource_name
 
+                # Tell the field whether the related resource was expanded for this request
+                expand_fields = getattr(self, 'expand_fields', None) or {}
+                field_object.expand = field_name in expand_fields
+                field_object.nested_fields = expand_fields.get(field_name)
+
             bundle.data[field_name] = field_object.dehydrate(bundle)
 
             # Check for an optional method to do further dehydration.
@@ -562,27 +813,83 @@ class BaseModelResource(BaseResource, ModelResource):
 
         Users should implement 'generate_obj_detail_cache_key' to construct the cache key for 
         a resource based on the object the resource is referring to.
+
+        If Meta.coalesce_requests is True, identical requests that are made at the same time
+        share one response. See _coalesce.
         """
+        return self._coalesce(request, self._get_detail, **kwargs)
+
+    def _get_detail(self, request, **kwargs):
+        """ Does the work for get_detail """
         self.bundle = Bundle() # Create an empty bundle and save it here for consistency across views
         self.bundle.data = request.GET.copy() 
         self.is_valid(bundle=self.bundle, request=request)
 
-        # If fields was passed in as an argument, remove all fields except for these
+        # If fields or expand were passed in as arguments, remove all fields except for these
+        # and choose which related resources to return in full
         fields = self.bundle.data.get('fields', None)
-        self.filter_fields(fields)
+        self.filter_fields(fields, expand=self.bundle.data.get('expand', None))
         
         try:
-            obj = self.obj_get(request=request, **self.remove_api_resource_names(kwargs))
+            with self.timer.phase('query'):
+                obj = self.obj_get(request=request, **self.remove_api_resource_names(kwargs))
         except ObjectDoesNotExist:
             return http.HttpNotFound()
         except MultipleObjectsReturned:
             return http.HttpMultipleChoices("More than one resource is found at this URI.")
 
-        bundle = self.build_bundle(obj=obj, request=request)
-        bundle = self.cached_full_dehydrate(bundle, **kwargs)
+        with self.timer.phase('dehydrate'):
+            bundle = self.build_bundle(obj=obj, request=request)
+            bundle = self.cached_full_dehydrate(bundle, **kwargs)
+        self.object_count = 1
         bundle = self.alter_detail_data_to_serialize(request, bundle)
         return self.create_response(request, bundle)
 
+    def dispatch_set(self, request, **kwargs):
+        return self.dispatch('set', request, **kwargs)
+
+    def get_set(self, request, **kwargs):
+        """ Returns several resources in one request given a semicolon separated list of ids,
+            i.e. /jobs/set/1;2;3/
+
+            All of the objects are fetched with a single query. Ids that weren't found, or whose
+            objects are removed or can't be viewed, are looked up again one at a time the way
+            the detail endpoint does, so each one gets the same object or the same error message
+            and status code, keyed by the id under 'errors'.
+        """
+        self.bundle = Bundle()
+        self.bundle.data = request.GET.copy()
+        self.is_valid(bundle=self.bundle, request=request)
+
+        # If fields or expand were passed in as arguments, remove all fields except for these
+        # and choose which related resources to return in full
+        fields = self.bundle.data.get('fields', None)
+        self.filter_fields(fields, expand=self.bundle.data.get('expand', None))
+
+        resource_ids = self._get_set_ids()
+        queryset = self._get_read_queryset(self.Meta.queryset)
+        with self.timer.phase('query'):
+            objects = self._get_objs_from_ids(resource_ids, queryset)
+
+        bundles = []
+        errors = {}
+        with self.timer.phase('dehydrate'):
+            for resource_id in resource_ids:
+                obj = objects.get(resource_id)
+                if obj is None or obj.is_removed() or not obj.has_view_perm(request.user):
+                    with self.timer.phase('query'):
+                        obj, error = self._find_obj([resource_id], queryset)
+                    if error:
+                        response_message, response_class = error
+                        errors[resource_id] = {'status': response_class.status_code,
+                                               'error_message': response_message}
+                        continue
+                bundle = self.build_bundle(obj=obj, request=request)
+                bundles.append(self.cached_full_dehydrate(bundle, **kwargs))
+
+        self.object_count = len(bundles)
+        return self.create_response(request, {'objects': bundles, 'errors': errors})
+
     def get_list(self, request, **kwargs):
         """
         Returns a serialized list of resources.
@@ -591,28 +898,33 @@ class BaseModelResource(BaseResource, ModelResource):
         set and serializes it.
 
         Should return a HttpResponse (200 OK).
-        """
-        # TODO: Uncached for now. Invalidation that works for everyone may be
-        #       impossible.
-        self.bundle = Bundle(data=request.GET.copy())
-        self.bundle.queryset = None
-        self.is_valid(bundle=self.bundle, request=request)
 
-        # If fields was passed in as an argument, remove all fields except for these
-        fields = self.bundle.data.get('fields', None)
-        self.filter_fields(fields)
+        If Meta.cache_anonymous_lists is True, responses to anonymous users are cached
+        by their query string until an object of the resource's model, or of a model its
+        related fields point to, changes. See _get_cache_models. Writes in other processes
+        only invalidate the cache if settings.API_RESPONSE_CACHE is shared by every process
+        (i.e. memcached). With a per-process cache such as locmem, other processes keep
+        serving their cached responses for up to Meta.anonymous_cache_timeout seconds.
 
-        objects = self.obj_get_list(request=request, **self.remove_api_resource_names(kwargs))
-        sorted_objects = self.apply_sorting(objects, options=request.GET)
+        If Meta.coalesce_requests is True, identical requests that are made at the same time
+        share one response. See _coalesce.
 
-        paginator = self._meta.paginator_class(request.GET, sorted_objects, resource_uri=self.get_resource_list_uri(), limit=self._meta.limit)
-        to_be_serialized = paginator.page()
+        Requests are throttled before either, so cached and shared responses count towards
+        the user's rate limit too.
+        """
+        self._check_rate_limit(request)
 
-        # Dehydrate the bundles in preparation for serialization.
-        bundles = [self.build_bundle(obj=obj, request=request) for obj in to_be_serialized['objects']]
-        to_be_serialized['objects'] = [self.cached_full_dehydrate(bundle, **kwargs) for bundle in bundles]
-        to_be_serialized = self.alter_list_data_to_serialize(request, to_be_serialized)
-        return self.create_response(request, to_be_serialized)
+        cache_key = self._get_response_cache_key(request)
+        if cache_key:
+            response = get_cached_response(cache_key)
+            if response is not None:
+                return self._add_rate_limit_headers(response)
+
+        response = self._coalesce(request, self._get_list, **kwargs)
+
+        if cache_key and response.status_code == 200:
+            cache_response(cache_key, response, self._meta.anonymous_cache_timeout)
+        return response
 
     def is_valid(self, bundle, request):
         """ Handles checking if the data provided by the user is valid.
@@ -635,15 +947,8 @@ class BaseModelResource(BaseResource, ModelResource):
             bundle.obj = self._lookup_obj()
             instance = bundle.obj
 
-        validation_form = self._meta.validation
-        extra_kwargs = {'request': request}
-
-        # If this resource was accessed by our own Django code, lift the max limit restrictions
-        if self.locally_accessed:
-            extra_kwargs['ignore_limit'] = True
-
         # Choose the correct validation form
-        if self.request_type == 'detail' and method == 'GET' and hasattr(self._meta, 'get_validation_form'):
+        if self.request_type in ('detail', 'set') and method == 'GET' and hasattr(self._meta, 'get_validation_form'):
             form_class = self.form_factory('get')
         elif self.request_type == 'list' and method == 'GET' and hasattr(self._meta, 'list_validation_form'):
             form_class = self.form_factory('list')
@@ -654,9 +959,62 @@ class BaseModelResource(BaseResource, ModelResource):
         else:
             form_class = None
 
+        with self.timer.phase('validate'):
+            if form_class and method == 'GET' and self._meta.memoize_get_validation:
+                self._validate_with_memo(bundle, request, form_class, self.request_type)
+            else:
+                self._validate_with_form(bundle, request, form_class, instance)
+
+    def _validate_with_memo(self, bundle, request, form_class, request_type):
+        """ Validates a GET like _validate_with_form, but remembers the result for each query
+            string, so the most common ones are only cleaned once per process.
+
+            Results are kept in a bounded LRU cache keyed by the resource class, the request
+            type, the exact query parameters and locally_accessed, so they must not depend on
+            the user. Only the order of the parameters is ignored, since values that look alike
+            (i.e. [id] and [id,]) can clean differently.
+            Errors are remembered too. Copies are returned so they can be changed safely.
+        """
+        key = (type(self), request_type, query_items(bundle.data), self.locally_accessed)
+        result = _validation_memo.get(key)
+        if result is None:
+            extra_kwargs = {'request': request}
+            if self.locally_accessed:
+                extra_kwargs['ignore_limit'] = True
+            form = form_class(bundle.data, **extra_kwargs)
+            if form.is_valid():
+                result = (form.cleaned_data, None)
+            else:
+                result = (None, dict((name, [force_unicode(x) for x in messages]) for name, messages in form.errors.items()))
+            _validation_memo.set(key, deepcopy(result))
+        else:
+            result = deepcopy(result)
+        self._validate_with_form(bundle, request, form_class, result=result)
+
+    def _validate_with_form(self, bundle, request, form_class, instance=None, result=None):
+        """ Runs bundle.data through form_class and replaces it with the form's cleaned data.
+
+            If validation fails, an error is raised with the error messages
+            serialized inside it. If form_class is None, nothing is validated.
+
+            result is a (cleaned_data, errors) tuple from an earlier validation of the same
+            data. If it is given, the form isn't run again.
+        """
+        extra_kwargs = {'request': request}
+
+        # If this resource was accessed by our own Django code, lift the max limit restrictions
+        if self.locally_accessed:
+            extra_kwargs['ignore_limit'] = True
+
         errors = {}
 
-        if form_class:
+        if result is not None:
+            cleaned_data, form_errors = result
+            if form_errors:
+                errors.update(form_errors)
+            else:
+                bundle.data = cleaned_data
+        elif form_class:
             data = bundle.data
             form = form_class(data, **extra_kwargs)
             form.instance = instance
@@ -685,9 +1043,60 @@ class BaseModelResource(BaseResource, ModelResource):
             bundle.obj = self.do_if_authorized(bundle.obj, 'submit')
         elif bundle.obj.is_hidden():
             bundle.obj = self.do_if_authorized(bundle.obj, 'submit_hidden')
+        if bundle.obj:
+            self._record_write()
         self.bundle = bundle
         return bundle
 
+    def post_list(self, request, **kwargs):
+        """ Creates a single object, or hands off to post_list_bulk if a JSON array was posted """
+        if request.raw_post_data.lstrip()[:1] == '[':
+            return self.post_list_bulk(request, **kwargs)
+        return super(BaseModelResource, self).post_list(request, **kwargs)
+
+    def post_list_bulk(self, request, **kwargs):
+        """ Creates or updates many objects from a JSON array posted to the list endpoint.
+
+            Only allowed if Meta.bulk_allowed is True. Items that contain an 'id' are looked up,
+            validated with the update_validation_form, authorized and updated as if they were
+            PUT to their detail endpoint, so they get the same errors. All other items are
+            validated with the create_validation_form and created. Writes happen in
+            transactions of Meta.bulk_chunk_size items. An item that fails to save, even with a
+            database error, is rolled back on its own and gets a 400 result. See _bulk_write.
+
+            If the query string contains atomic=true, the whole batch runs in a single
+            transaction and is rolled back as soon as one item fails.
+
+            The response contains one result per item, in the order the items were posted.
+        """
+        self.bundle = Bundle()
+
+        if not self._meta.bulk_allowed:
+            self.raise_error("Bulk writes are not allowed on this resource.", HttpBadRequest)
+
+        items = self.deserialize(request, request.raw_post_data, format=request.META.get('CONTENT_TYPE', 'application/json'))
+        if len(items) > self._meta.bulk_max_items:
+            self.raise_error(("Too many objects were supplied. The max number of objects "
+                              "per request is {0}.").format(self._meta.bulk_max_items), HttpBadRequest)
+
+        atomic = request.GET.get('atomic', '').lower() in ('1', 'true')
+        self._bulk_writing = True
+        try:
+            results, succeeded = self._bulk_write(request, items, atomic)
+        finally:
+            self._bulk_writing = False
+
+        meta = {'total_count': len(items),
+                'created': len([x for x in results if x['status'] == http.HttpCreated.status_code]),
+                'updated': len([x for x in results if x['status'] == HttpResponse.status_code]),
+                'failed': len([x for x in results if x.get('errors') or x.get('error_message')]),
+                'atomic': atomic}
+
+        if meta['created'] or meta['updated']:
+            record_write(request) # Once for the whole batch
+        response_class = HttpResponse if succeeded else HttpBadRequest
+        return self.create_response(request, {'meta': meta, 'objects': results}, response_class)
+
     def obj_get(self, request, **kwargs):
         """ Fetches a single object. 
         
@@ -706,16 +1115,20 @@ class BaseModelResource(BaseResource, ModelResource):
         filters = self.bundle.data.copy()
 
         # Adjust the base queryset
-        queryset = self.alter_queryset(queryset=self.Meta.queryset, filters=filters)
-
-        # Create the args and kwargs that will be used as filters
-        applicable_filters = self.build_filters(filters=filters)
-        complex_filters = self.build_complex_filters(filters=filters)
+        queryset = self._get_read_queryset(self.alter_queryset(queryset=self.Meta.queryset, filters=filters))
         select_related = self.Meta.select_related
 
         try:
+            # Join any expanded foreign keys in the same query
+            if select_related:
+                select_related = list(select_related)
+                for field_name in getattr(self, 'expand_fields', None) or {}:
+                    field_object = self.fields[field_name]
+                    if isinstance(field_object, BaseForeignKey) and field_object.attribute not in select_related:
+                        select_related.append(field_object.attribute)
+
             # Apply the filters
-            base_object_list = queryset.filter(complex_filters, **applicable_filters).filter_view_perms(request.user).select_related(*select_related)
+            base_object_list = self._apply_list_filters(queryset, filters).filter_view_perms(request.user).select_related(*select_related)
 
             # Save the queryset
             self.bundle.queryset = base_object_list
@@ -733,12 +1146,16 @@ class BaseModelResource(BaseResource, ModelResource):
         if not bundle.obj:
             self.bundle = bundle
             self.raise_error("You are not authorized to edit this object", HttpUnauthorized)
+        self._record_write()
         self.bundle = bundle
         return bundle
 
     def obj_delete(self, **kwargs):
         obj = self._lookup_obj()
-        return self.do_if_authorized(obj, 'remove')
+        removed = self.do_if_authorized(obj, 'remove')
+        if removed:
+            self._record_write()
+        return removed
 
     def override_urls(self):
         urls = super(BaseModelResource, self).override_urls()
@@ -748,8 +1165,11 @@ class BaseModelResource(BaseResource, ModelResource):
             merge_url = url(r"^(?P<resource_name>{0})/merge/(?P<resource_id_1>{1})/(?P<resource_id_2>{1})/$".format(self._meta.resource_name, num_regex), self.wrap_view('merge'), name='api_merge')
             unmerge_url = url(r"^(?P<resource_name>{0})/unmerge/(?P<resource_id>{1})/$".format(self._meta.resource_name, num_regex), self.wrap_view('unmerge'), name='api_unmerge')
 
+            set_url = url(r"^(?P<resource_name>{0})/set/(?P<resource_id_list>{1}(?:;{1})*)/$".format(self._meta.resource_name, num_regex), self.wrap_view('dispatch_set'), name='api_dispatch_set')
+
             urls.append(merge_url)
             urls.append(unmerge_url)
+            urls.append(set_url)
         return urls
 
     def partial_dehydrate(self, bundle):
@@ -764,6 +1184,491 @@ class BaseModelResource(BaseResource, ModelResource):
         bundle = self.dehydrate(bundle)
         return bundle
 
+    def _record_write(self):
+        """ Keeps the user's reads on the primary database after a successful write. Bulk writes
+            record it once for the whole request in post_list_bulk instead.
+        """
+        if not getattr(self, '_bulk_writing', False):
+            record_write(self.request)
+
+    def _bulk_write(self, request, items, atomic):
+        """ Does the work for post_list_bulk. Returns the list of per-item results and
+            False if an atomic batch was rolled back.
+
+            Each item is written inside a savepoint, so a failed item's writes are undone. On
+            databases without savepoints (i.e. SQLite), each item of a non-atomic batch gets
+            its own transaction instead.
+        """
+        results = [None] * len(items)
+        indices = range(len(items))
+        if atomic:
+            chunks = [indices]
+        else:
+            chunk_size = self._meta.bulk_chunk_size if connection.features.uses_savepoints else 1
+            chunks = [indices[i:i + chunk_size] for i in range(0, len(indices), chunk_size)]
+
+        for chunk in chunks:
+            try:
+                with transaction.commit_on_success():
+                    for index in chunk:
+                        if not self._bulk_write_savepoint(request, items, index, results) and \
+                           (atomic or not connection.features.uses_savepoints):
+                            raise _BulkRollback
+            except _BulkRollback:
+                if not atomic:
+                    continue # Only the failed item was in the transaction
+                # Nothing in the batch was written, so report every other item as rolled back
+                for index in indices:
+                    if results[index] is None or not results[index].get('errors') and \
+                                                  not results[index].get('error_message'):
+                        results[index] = {'index': index,
+                                          'status': None,
+                                          'error_message': ("This object was not saved because another "
+                                                            "object in the batch failed.")}
+                return results, False
+
+        return results, True
+
+    def _bulk_write_savepoint(self, request, items, index, results):
+        """ Writes items[index] inside a savepoint and saves its result in results. Returns
+            False if the item failed and its savepoint was rolled back.
+        """
+        sid = transaction.savepoint()
+        try:
+            status, bundle = self._bulk_write_item(request, items[index])
+        except ImmediateHttpResponse, e:
+            transaction.savepoint_rollback(sid)
+            results[index] = self._bulk_error_result(index, e.response)
+            return False
+        except _BULK_ITEM_ERRORS, e:
+            transaction.savepoint_rollback(sid)
+            message = ', '.join(e.messages) if isinstance(e, ValidationError) else unicode(e)
+            results[index] = {'index': index, 'status': HttpBadRequest.status_code, 'error_message': message}
+            return False
+        transaction.savepoint_commit(sid)
+        result = {'index': index,
+                  'status': status,
+                  'id': bundle.obj.id,
+                  'resource_uri': self.get_resource_uri(bundle)}
+        results[index] = self._format_api_uri(request, result, [])
+        return True
+
+    def _bulk_write_item(self, request, data):
+        """ Validates and saves a single item of a bulk write.
+
+            Returns a tuple of the HTTP status code for the item and the saved bundle.
+            Errors are raised the same way they are for single-object requests.
+        """
+        if not isinstance(data, dict):
+            self.raise_error("Each object in the list must be a JSON object.", HttpBadRequest)
+        data = dict_strip_unicode_keys(data)
+
+        resource_id = data.get('id')
+        if resource_id:
+            try:
+                resource_id = int(resource_id)
+            except (TypeError, ValueError):
+                self.raise_error("Invalid resource lookup data provided. Please provide a valid id (positive integer).", HttpBadRequest)
+
+            # Updates are looked up, validated and authorized as a PUT to the object's detail endpoint would be
+            with self._as_method(request, 'PUT'):
+                instance = self._lookup_obj(resource_ids=[resource_id])
+                bundle = self.build_bundle(obj=instance, data=data, request=request)
+                if hasattr(self._meta, 'update_validation_form'):
+                    self._validate_with_form(bundle, request, self.form_factory('update'), instance)
+                bundle = self.obj_update(bundle, request)
+            status = HttpResponse.status_code
+        else:
+            bundle = self.build_bundle(data=data, request=request)
+            if hasattr(self._meta, 'create_validation_form'):
+                self._validate_with_form(bundle, request, self.form_factory('create'))
+            bundle = self.obj_create(bundle, request=request)
+            status = http.HttpCreated.status_code
+
+        if not bundle.obj:
+            self.raise_error("You are not authorized to create this object", HttpUnauthorized)
+        return status, bundle
+
+    @contextmanager
+    def _as_method(self, request, method):
+        """ Makes request and this resource look like a request with another HTTP method
+            inside the block, so is_authorized and the forms treat it the same way
+        """
+        original_method, original_resource_method = request.META.get('REQUEST_METHOD'), self.method
+        request.META['REQUEST_METHOD'] = self.method = method
+        try:
+            yield
+        finally:
+            request.META['REQUEST_METHOD'], self.method = original_method, original_resource_method
+
+    def _bulk_error_result(self, index, response):
+        """ Turns an error response raised while writing a bulk item into that item's result """
+        result = {'index': index, 'status': response.status_code}
+        try:
+            result.update(simplejson.loads(response.content))
+        except (JSONDecodeError, ValueError):
+            result['error_message'] = response.content
+        return result
+
+    def _can_stream_list(self):
+        """ Returns True if list pages can be dehydrated lazily while they are serialized.
+            They can't if alter_list_data_to_serialize is overridden, since it expects a list,
+            or if they are dehydrated by several threads.
+        """
+        alter_list = getattr(type(self).alter_list_data_to_serialize, 'im_func', None)
+        return alter_list is Resource.alter_list_data_to_serialize.im_func and \
+               not (self._meta.dehydrate_threads and self._meta.dehydrate_threads > 1)
+
+    def _coalesce(self, request, func, **kwargs):
+        """ Returns func(request, **kwargs). If Meta.coalesce_requests is True and an identical
+            GET from the same user is already being computed in this process, waits up to
+            Meta.coalesce_timeout seconds for that response and returns a copy of it instead.
+
+            Requests are only shared between threads of one process, so this does nothing on
+            a server that runs each worker in its own single-threaded process (i.e. prefork).
+            Each request is handled by its own instance of the resource (see wrap_view), so the
+            request that builds the response only uses its own state. Only requests with the
+            same user, format, query and URL share a response, so the body is the one the
+            waiting request would have built. The headers that belong to a single request
+            (rate limits, timings and query counts) aren't copied, and the waiting request
+            adds its own.
+        """
+        if not self._meta.coalesce_requests or self.locally_accessed or request.method != 'GET':
+            return func(request, **kwargs)
+
+        user_id = request.user.id if request.user and request.user.is_authenticated() else None
+        key = (self._meta.resource_name, self.request_type, user_id,
+               self.determine_format(request), normalize_query(request.GET),
+               tuple(sorted(self.remove_api_resource_names(kwargs).items())))
+        response, shared = single_flight(key, lambda: func(request, **kwargs), self._meta.coalesce_timeout)
+        if shared:
+            response = copy_response(response, exclude_headers=PER_REQUEST_HEADERS)
+            response['X-Api-Coalesced'] = 'true'
+            response = self._add_rate_limit_headers(response)
+        return response
+
+    def _copy_for_thread(self):
+        """ Returns a new instance of this resource with the same request state.
+
+            Fields keep state while they dehydrate related resources, so each thread that
+            dehydrates for this request needs its own instance and fields.
+        """
+        resource = self.__class__()
+        resource.__dict__.update((key, value) for key, value in self.__dict__.items() if key != 'fields')
+        return resource
+
+    def _dehydrate_list(self, bundles, **kwargs):
+        """ Dehydrates the bundles for a page of a list and returns them in the same order.
+
+            If Meta.dehydrate_threads is more than 1, the bundles are dehydrated by that many
+            threads, each with its own copy of the resource. This helps resources whose
+            dehydrate methods wait on I/O such as caches, file storage or other databases.
+        """
+        num_threads = self._meta.dehydrate_threads
+        if not num_threads or num_threads < 2 or len(bundles) < 2:
+            return [self.cached_full_dehydrate(bundle, **kwargs) for bundle in bundles]
+
+        dehydrate = lambda resource, bundle: resource.cached_full_dehydrate(bundle, **kwargs)
+        return thread_map(dehydrate, bundles, num_threads, make_state=self._copy_for_thread)
+
+    def _dehydrate_stream(self, objects, request, **kwargs):
+        """ Yields each of objects as a dehydrated bundle. Each bundle is only built when the
+            serializer gets to it, so it can be released once it has been encoded.
+
+            Querysets are read with iterator() so their objects aren't all kept in its cache.
+        """
+        self.object_count = 0
+        if isinstance(objects, QuerySet):
+            objects = objects.iterator()
+        for obj in objects:
+            self.object_count += 1
+            yield self.cached_full_dehydrate(self._build_list_bundle(obj, request), **kwargs)
+
+    def _fast_dehydrate_stream(self, objects, plan):
+        """ Yields the dehydrated data of each object in a queryset using the plan from
+            _get_fast_dehydrate_plan. Only the columns in the plan are fetched, with values_list.
+        """
+        columns = ['id']
+        for field_name, field_columns, func in plan:
+            columns += [x for x in field_columns if x not in columns]
+        indexes = [[columns.index(x) for x in field_columns] for field_name, field_columns, func in plan]
+
+        request = self.request
+        api_uri_keys = self._meta.api_uri_keys
+        self.object_count = 0
+        for row in objects.values_list(*columns).iterator():
+            self.object_count += 1
+            data = {}
+            for (field_name, field_columns, func), index in zip(plan, indexes):
+                data[field_name] = func(*[row[i] for i in index])
+
+            # The same steps as dehydrate
+            data = self._format_api_uri(request, data, api_uri_keys)
+            data = self._format_id_fields(data)
+            yield self._escape_fields(data)
+
+    def _find_invalid_field(self, fields):
+        """ Returns the first name in fields that is not a field on this resource, or None if
+            they are all valid. Dotted names are checked against the related resource.
+        """
+        valid_fields = self._get_valid_fields()[1]
+        related_fields = self._get_related_fields()
+        for field in fields:
+            name, dot, nested = field.partition('.')
+            if name not in valid_fields:
+                return field
+            if nested:
+                if name not in related_fields:
+                    return field
+                invalid_field = related_fields[name].to_class()._find_invalid_field([nested])
+                if invalid_field:
+                    return "{0}.{1}".format(name, invalid_field)
+        return None
+
+    def _get_list(self, request, **kwargs):
+        """ Does the work for get_list """
+        self.bundle = Bundle(data=request.GET.copy())
+        self.bundle.queryset = None
+        self.is_valid(bundle=self.bundle, request=request)
+
+        # If fields or expand were passed in as arguments, remove all fields except for these
+        # and choose which related resources to return in full
+        fields = self.bundle.data.get('fields', None)
+        self.filter_fields(fields, expand=self.bundle.data.get('expand', None))
+
+        if isinstance(self.bundle.data.get('changed_since'), dict) or self.bundle.data.get('cursor'):
+            return self._get_changes(request, **kwargs)
+
+        with self.timer.phase('query'):
+            objects = self.obj_get_list(request=request, **self.remove_api_resource_names(kwargs))
+            sorted_objects = self.apply_sorting(objects, options=request.GET)
+
+            paginator = self._meta.paginator_class(request.GET, sorted_objects, resource_uri=self.get_resource_list_uri(), limit=self._meta.limit)
+            to_be_serialized = paginator.page()
+
+        fast_dehydrate_plan = self._get_fast_dehydrate_plan(to_be_serialized['objects'])
+        if fast_dehydrate_plan:
+            # Every field is read straight from a column, so no objects or bundles are needed
+            to_be_serialized['objects'] = self._fast_dehydrate_stream(to_be_serialized['objects'], fast_dehydrate_plan)
+            return self.create_response(request, to_be_serialized)
+
+        if self._meta.stream_lists and self._can_stream_list():
+            # The page is fetched, dehydrated and encoded one object at a time while it is
+            # serialized, so only one dehydrated object is kept at a time. The encoded output
+            # still grows with the page.
+            to_be_serialized['objects'] = self._dehydrate_stream(to_be_serialized['objects'], request, **kwargs)
+            return self.create_response(request, to_be_serialized)
+
+        with self.timer.phase('query'):
+            # Building the bundles evaluates the page's queryset
+            bundles = [self._build_list_bundle(obj, request) for obj in to_be_serialized['objects']]
+            self.object_count = len(bundles)
+
+        # Dehydrate the bundles in preparation for serialization.
+        with self.timer.phase('dehydrate'):
+            to_be_serialized['objects'] = self._dehydrate_list(bundles, **kwargs)
+        to_be_serialized = self.alter_list_data_to_serialize(request, to_be_serialized)
+        return self.create_response(request, to_be_serialized)
+
+    def _get_changes(self, request, **kwargs):
+        """ Returns the objects that changed since the time in changed_since or the position in
+            cursor, oldest change first, so clients can keep a local copy in sync.
+
+            An object's change time is its action_time, or its submitted_time if it was never
+            updated. Objects that were removed since then are returned in 'removed' as
+            tombstones with only their id, resource_uri and time_last_updated. Objects that
+            still exist but the user can't see (i.e. hidden ones) are left out of both lists.
+
+            Changes are read from Meta.queryset, so if it already excludes removed objects
+            their tombstones are never sent. Resources that sync should use a queryset that
+            includes them and leave it to filter_view_perms to hide them.
+
+            meta['next_cursor'] is the position after the last change in the page. Pass it as
+            cursor to get the next page, or to sync again later once has_more is False.
+        """
+        with self.timer.phase('query'):
+            filters = self.bundle.data.copy()
+            queryset = self._get_read_queryset(self.alter_queryset(queryset=self.Meta.queryset, filters=filters))
+            try:
+                queryset = self._apply_list_filters(queryset, filters)
+            except ValueError:
+                self.raise_error("Invalid resource lookup data provided.", http.HttpBadRequest)
+
+            # Order by the change time and the id so the position of each change is stable
+            changed_time = self._get_changed_time_sql(queryset.model)
+            queryset = queryset.extra(select={'api_changed_time': changed_time})
+            if self.bundle.data.get('cursor'):
+                cursor_time, cursor_id = self._parse_cursor(self.bundle.data['cursor'])
+                queryset = queryset.extra(where=['({0} > %s OR ({0} = %s AND {1} > %s))'.format(changed_time, self._get_column_sql(queryset.model, 'id'))],
+                                          params=[cursor_time, cursor_time, cursor_id])
+            else:
+                cursor_time, cursor_id = self.bundle.data['changed_since']['utc_time'], 0
+                queryset = queryset.extra(where=['{0} >= %s'.format(changed_time)], params=[cursor_time])
+            queryset = queryset.order_by('api_changed_time', 'id')
+
+            limit = self._meta.paginator_class(request.GET, queryset, limit=self._meta.limit).get_limit() or self._meta.limit
+            changes = list(queryset[:limit + 1])
+            has_more = len(changes) > limit
+            changes = changes[:limit]
+
+            # Only the changed objects the user can still see are returned in full
+            visible_ids = set()
+            if changes:
+                visible_objects = self._get_read_queryset(self.Meta.queryset).filter(id__in=[obj.id for obj in changes]).filter_view_perms(request.user)
+                visible_ids = set(self.apply_authorization_limits(request, visible_objects).values_list('id', flat=True))
+            bundles = [self._build_list_bundle(obj, request) for obj in changes if obj.id in visible_ids]
+            self.bundle.queryset = queryset
+            self.object_count = len(bundles)
+
+        with self.timer.phase('dehydrate'):
+            objects = self._dehydrate_list(bundles, **kwargs)
+            removed = [self._get_tombstone(obj) for obj in changes
+                       if obj.id not in visible_ids and obj.is_removed()]
+
+        if changes:
+            last = changes[-1]
+            cursor_time, cursor_id = (last.action_time or last.submitted_time), last.id
+        next_cursor = self._format_cursor(cursor_time, cursor_id)
+
+        next_params = request.GET.copy()
+        next_params.pop('changed_since', None)
+        next_params['cursor'] = next_cursor
+        to_be_serialized = {'meta': {'limit': limit,
+                                     'has_more': has_more,
+                                     'next_cursor': next_cursor,
+                                     'next': "{0}?{1}".format(self.get_resource_list_uri(), next_params.urlencode()) if has_more else None},
+                            'objects': objects,
+                            'removed': removed}
+        return self.create_response(request, to_be_serialized)
+
+    def _get_throttle_identity(self, request):
+        """ Returns who a request is throttled as: the user from get_identifier, or the IP
+            address for anonymous users
+        """
+        user = self.get_identifier(request)
+        if user and user.is_authenticated():
+            return 'user-{0}'.format(user.id)
+        return 'ip-{0}'.format(request.META.get('REMOTE_ADDR'))
+
+    def _get_tombstone(self, obj):
+        """ Returns what a sync sends for an object that was removed """
+        tombstone = {'id': obj.id,
+                     'resource_uri': self.get_resource_uri(self.build_bundle(obj=obj)),
+                     'time_last_updated': isoformat(obj.action_time or obj.submitted_time)}
+        return self._format_api_uri(self.request, tombstone, [])
+
+    def _get_column_sql(self, model, field_name):
+        return "{0}.{1}".format(connection.ops.quote_name(model._meta.db_table),
+                                connection.ops.quote_name(model._meta.get_field(field_name).column))
+
+    def _get_changed_time_sql(self, model):
+        """ Returns the SQL for the time an object last changed """
+        return "COALESCE({0}, {1})".format(self._get_column_sql(model, 'action_time'),
+                                           self._get_column_sql(model, 'submitted_time'))
+
+    def _format_cursor(self, changed_time, id):
+        return "{0}_{1}".format(changed_time.strftime(CURSOR_TIME_FORMAT), id)
+
+    def _parse_cursor(self, cursor):
+        """ Returns the change time and id in a cursor made by _format_cursor """
+        try:
+            changed_time, dash, id = cursor.rpartition('_')
+            return datetime.datetime.strptime(changed_time, CURSOR_TIME_FORMAT), int(id)
+        except ValueError:
+            self.raise_error("The cursor '{0}' is not valid.".format(cursor), http.HttpBadRequest)
+
+    def _apply_list_filters(self, queryset, filters):
+        """ Applies the filters and complex filters built from the user-entered filters """
+        applicable_filters = self.build_filters(filters=filters)
+        complex_filters = self.build_complex_filters(filters=filters)
+        return queryset.filter(complex_filters, **applicable_filters)
+
+    def _get_fast_dehydrate_plan(self, objects):
+        """ Returns how to dehydrate a page of objects straight from their columns if
+            Meta.fast_dehydrate is True and every field being returned can be, or None if the
+            page has to be dehydrated normally.
+
+            The plan is a list of (field name, columns, function) tuples. The function is
+            called with the values of the columns and returns the value of the field.
+        """
+        if not self._meta.fast_dehydrate or not isinstance(objects, QuerySet) or not self._can_stream_list():
+            return None
+
+        # Overridden dehydration methods could do anything with the objects
+        cls = type(self)
+        for name, base in (('full_dehydrate', BaseModelResource), ('cached_full_dehydrate', BaseModelResource),
+                           ('dehydrate', BaseResource)):
+            if getattr(cls, name).im_func is not getattr(base, name).im_func:
+                return None
+
+        ignore_fields = getattr(self, 'ignore_fields', None) or []
+        plan = []
+        for field_name, field_object in self.fields.items():
+            if field_name in ignore_fields:
+                # Ignored foreign keys still return their _id field, just like full_dehydrate
+                id_field = "{0}_id".format(field_name)
+                if not isinstance(field_object, BaseForeignKey) or id_field in ignore_fields:
+                    continue
+                field_name = id_field
+                field_object = fields.IntegerField(id_field, null=True)
+
+            step = self._get_fast_dehydrate_step(field_name, field_object)
+            if step is None:
+                return None
+            plan.append(step)
+        return plan
+
+    def _get_fast_dehydrate_step(self, field_name, field_object):
+        """ Returns the (field name, columns, function) tuple to dehydrate one field straight
+            from its columns, or None if it needs the normal dehydration
+        """
+        method = getattr(type(self), "dehydrate_{0}".format(field_name), None)
+        if method is not None:
+            # Only the dehydrate methods defined here are known to just read columns
+            if field_name not in ('id', 'resource_uri', 'time_created', 'time_last_updated') or \
+               method.im_func is not getattr(BaseModelResource, "dehydrate_{0}".format(field_name)).im_func:
+                return None
+            if field_name == 'id':
+                return (field_name, ('id',), lambda id: id)
+            elif field_name == 'resource_uri':
+                if type(self).get_resource_uri.im_func is not BaseResource.get_resource_uri.im_func:
+                    return None
+                return (field_name, ('id',), self._get_uri_template('api_dispatch_detail', ['resource_id']).format)
+            elif field_name == 'time_created':
+                return (field_name, ('submitted_time',), isoformat)
+            return (field_name, ('action_time', 'submitted_time'), lambda action_time, submitted_time: isoformat(action_time or submitted_time))
+
+        if getattr(field_object, 'dehydrated_type', None) == 'related' or \
+           type(field_object).dehydrate.im_func is not fields.ApiField.dehydrate.im_func:
+            return None
+
+        if field_object.attribute is None:
+            value = field_object.convert(field_object.default) if field_object.has_default() else None
+            return (field_name, (), lambda: value)
+
+        # The attribute has to be a column. Foreign keys are only allowed by their _id attribute,
+        # which has the same value as the column.
+        model_fields = dict((x.attname, x) for x in self._meta.queryset.model._meta.fields)
+        if not isinstance(field_object.attribute, basestring) or field_object.attribute not in model_fields:
+            return None
+
+        # values_list returns the database's value without calling the field's to_python. Custom
+        # fields that convert it (like SubfieldBase fields, which convert the model's attribute)
+        # would give a different value, so only Django's own fields are read straight from a column.
+        to_python_class = [x for x in type(model_fields[field_object.attribute]).__mro__ if 'to_python' in x.__dict__][0]
+        if not to_python_class.__module__.startswith('django.db.models.'):
+            return None
+
+        def dehydrate_column(value):
+            # The same handling of empty values as ApiField.dehydrate
+            if value is None:
+                if field_object.has_default():
+                    value = field_object._default
+                elif not field_object.null:
+                    raise ApiFieldError("The object has an empty attribute '{0}' and doesn't allow a default or null value.".format(field_object.attribute))
+            return field_object.convert(value)
+        return (field_name, (field_object.attribute,), dehydrate_column)
+
     def _get_obj_from_ids(self, ids, queryset):
         """ Gets an object from its resource ids. If no object could be found, this function
             should raise an Http404 exception.
@@ -776,6 +1681,79 @@ class BaseModelResource(BaseResource, ModelResource):
         """
         return queryset.get_from_id(ids[0], select_related=self.Meta.select_related)
 
+    def _get_objs_from_ids(self, ids, queryset):
+        """ Gets several objects from their ids with a single query.
+
+            Returns a dict of the objects that were found keyed by their id.
+        """
+        objects = queryset.filter(id__in=ids).select_related(*self.Meta.select_related)
+        return dict((obj.id, obj) for obj in objects)
+
+    def _get_set_ids(self):
+        """ Returns the list of ids passed to a set endpoint with duplicates removed.
+            Raises an immediate error if more than Meta.max_set_ids are requested or if one
+            of them isn't a positive integer.
+        """
+        raw_ids = [x for x in self.request_kwargs.get('resource_id_list', '').split(';') if x]
+        if len(raw_ids) > self._meta.max_set_ids:
+            self.raise_error(("Too many ids were requested. The max number of ids per request "
+                              "is {0}.").format(self._meta.max_set_ids), http.HttpBadRequest)
+
+        resource_ids = []
+        seen = set()
+        for resource_id in raw_ids:
+            if not resource_id.isdigit():
+                self.raise_error("Invalid resource lookup data provided. '{0}' is not a valid resource_id.".format(esc(resource_id)),
+                                 http.HttpBadRequest)
+            resource_id = int(resource_id)
+            if resource_id not in seen:
+                seen.add(resource_id)
+                resource_ids.append(resource_id)
+        return resource_ids
+
+    def _get_read_queryset(self, queryset):
+        """ Returns queryset on Meta.read_db_alias if this is a GET and the user hasn't written
+            recently, otherwise returns queryset unchanged so it uses the primary database
+        """
+        if not self._meta.read_db_alias or getattr(self, 'method', None) != 'GET' or recently_wrote(self.request):
+            return queryset
+        return queryset.using(self._meta.read_db_alias)
+
+    def _get_related_fields(self):
+        """ Returns a dict of the fields on this resource that point to other resources """
+        return dict((name, field_object) for name, field_object in self.fields.items()
+                    if isinstance(field_object, BaseForeignKey) or isinstance(field_object, BaseRelatedField))
+
+    def _get_response_cache_key(self, request):
+        """ Returns the key to cache the response to this request under, or None if it can't be cached.
+            Only GETs to the list endpoint from anonymous users are cached.
+        """
+        if not self._meta.cache_anonymous_lists or self.locally_accessed or request.method != 'GET' or \
+           (request.user and request.user.is_authenticated()):
+            return None
+        return get_response_cache_key(self._meta.resource_name, self._get_cache_models(),
+                                      self.determine_format(request), request.GET)
+
+    @classmethod
+    def _get_cache_models(cls):
+        """ Returns the models whose changes invalidate this resource's cached list responses:
+            its own model and the models of the resources its related fields point to.
+            Resources that are only reached through those related resources aren't included.
+        """
+        models = _cache_models.get(cls)
+        if models is None:
+            models = [cls._meta.queryset.model]
+            for field_object in cls.base_fields.values():
+                if not isinstance(field_object, (BaseForeignKey, BaseRelatedField)):
+                    continue
+                queryset = getattr(field_object.to_class._meta, 'queryset', None)
+                if queryset is not None and queryset.model not in models:
+                    models.append(queryset.model)
+            for model in models:
+                watch_model(model)
+            _cache_models[cls] = models
+        return models
+
     def _get_resource_ids(self, num_resource_ids=None):
         """ Takes a user-entered dict of kwargs, and returns a list of resource_ids.
             If any of the resource_ids are invalid in any way, it throws raises an immediate error
@@ -815,35 +1793,94 @@ class BaseModelResource(BaseResource, ModelResource):
         if not resource_ids:
             resource_ids = self._get_resource_ids()
         if not queryset:
-            queryset = self.Meta.queryset
+            queryset = self._get_read_queryset(self.Meta.queryset)
+        object, error = self._find_obj(resource_ids, queryset)
+        if error is None:
+            return object
+
+        response_message, response_class = error
+        self.bundle = Bundle() 
+        self.raise_error(response_message, response_class)
+
+    def _find_obj(self, resource_ids, queryset):
+        """ Does the work for _lookup_obj without raising an error.
+
+            Returns a tuple of the object and None if the user can view it, otherwise a tuple
+            of None and the (error message, response class) the user should get.
+        """
         try:
             object = self._get_obj_from_ids(resource_ids, queryset)
             if not object:
                 raise Http404
             elif object.has_view_perm(self.request.user): 
-                return object
-            elif object.is_hidden():
-                response_message = "You are not authorized to access this resource \
-                                    because the owner has marked it as hidden."
-                response_class = http.HttpForbidden
-            elif object.is_removed():
-                response_message = "This resource has been removed and is no longer accessible."
-                response_class = http.HttpGone
-            else:
-                response_message = "You are not authorized to access this resource."
-                response_class = http.HttpForbidden
+                return object, None
+            return None, self._lookup_error(object)
         except Http404, e:
-            response_message = "A resource with this id could not be found."
-            response_class = http.HttpNotFound
+            return None, self._lookup_error(None)
         except Http410, e:
-            response_message = "This resource has already been removed and is no longer accessible."
-            response_class = http.HttpGone
+            return None, ("This resource has already been removed and is no longer accessible.", http.HttpGone)
 
-        self.bundle = Bundle() 
-        self.raise_error(response_message, response_class)
+    def _get_valid_fields(self):
+        """ Returns a tuple of the list of fields defined on the resource and the list of all
+            field names that can be requested with the 'fields' argument
+        """
+        # Specify any fields that must show up no matter what 
+        permanent_fields = ['resource_uri']
+
+        # Create the valid id field names
+        id_fields = []
+        for declared_field_name, declared_field_object in self.declared_fields.items() + self.fields.items():
+            if isinstance(declared_field_object, BaseForeignKey):
+                id_fields.append("{0}_id".format(declared_field_name))
+
+        # Specify fields defined on the resource
+        initial_fields = self.fields.keys() + self.declared_fields.keys() + self.Meta.fields + id_fields
+
+        # Make a list of all valid fields
+        valid_fields = initial_fields + permanent_fields
+        return initial_fields, valid_fields
+
+    def _lookup_error(self, object):
+        """ Returns a tuple of the error message and response class for an object that was
+            looked up but cannot be viewed by the user. object is None if it was not found.
+        """
+        if object is None:
+            return ("A resource with this id could not be found.", http.HttpNotFound)
+        elif object.is_hidden():
+            response_message = "You are not authorized to access this resource \
+                                    because the owner has marked it as hidden."
+            return (response_message, http.HttpForbidden)
+        elif object.is_removed():
+            return ("This resource has been removed and is no longer accessible.", http.HttpGone)
+        else:
+            return ("You are not authorized to access this resource.", http.HttpForbidden)
 
     class Meta(BaseResource.Meta):
         select_related = []
         get_validation_form = BaseModelResourceForm
         maps_to = {}
         cache = NoCache()
+        bulk_allowed = False # Allow a JSON array of objects to be posted to the list endpoint
+        bulk_max_items = 1000 # The max number of objects in a single bulk request
+        bulk_chunk_size = 100 # The number of objects written per transaction in a bulk request
+        set_allowed_methods = ['get']
+        max_set_ids = 100 # The max number of ids that can be requested at once from the set endpoint
+        cache_anonymous_lists = False # Cache the list responses for anonymous users. They are invalidated when this resource's
+                                      # model or a directly related resource's model changes, through a cache every process
+                                      # shares. See get_list
+        anonymous_cache_timeout = 300 # The number of seconds a cached list response is kept
+        read_db_alias = None # The database alias GET requests read from, i.e. a replica. Users read
+                             # from the primary for settings.API_READ_STICKINESS seconds after they write
+        fast_dehydrate = False # Read list pages straight from their columns with values_list when
+                               # every field returned is a plain column. See _get_fast_dehydrate_plan
+        export_chunk_size = 500 # The number of objects fetched per query by export_ndjson
+        stream_lists = False # Dehydrate list pages one object at a time while they are serialized. See _dehydrate_stream
+        memoize_get_validation = False # Remember the cleaned data or errors of the most common GET query strings.
+                                       # Only for resources whose forms don't depend on the user. See _validate_with_memo
+        coalesce_requests = False # Identical GETs made at the same time by the same user share one response.
+                                  # Only works on threaded servers. See _coalesce
+        coalesce_timeout = 10 # The max number of seconds a request waits for an identical one
+        rate_limit = None # An api.throttle.TokenBucket that limits how often each user gets the list
+        count_rate_limit = None # The TokenBucket used instead of rate_limit for limit=0 requests
+        dehydrate_threads = 0 # If more than 1, list pages are dehydrated by this many threads.
+                              # Each thread uses its own database connection.
@@ -0,0 +1,139 @@
+from __future__ import unicode_literals
+
+import re
+
+from django.conf.urls.defaults import patterns, url
+from django.core.urlresolvers import RegexURLResolver, Resolver404
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+
+from api.resources.generic import BaseModelResource, num_regex
+
+
+class ApiRouter(object):
+    """ Routes API requests to resources with one dict lookup, instead of having Django try
+        every resource's URL patterns in turn.
+
+        Usage (in api/urls.py):
+            router = ApiRouter()
+            router.register(JobResource())
+            router.register(UserResource())
+            urlpatterns = router.urls
+
+        The path is split into segments once. The first segment is the resource_name, and the
+        rest choose the view: nothing for the list, 1 or 2 ids for the detail (depending on
+        Meta.num_resource_ids), and merge/<id>/<id>/, unmerge/<id>/ or set/<ids>/. Paths that
+        don't fit are resolved with the resource's own override_urls, so custom URLs still work.
+
+        The router's pattern matches every path under the prefix it is included at. Paths with
+        no registered resource_name, or that none of the resource's URLs match, raise Http404
+        instead of falling through to the URL patterns after it, so other views must be
+        included before the router or at a different prefix.
+
+        The usual named patterns (api_dispatch_list, api_dispatch_detail, api_merge, ...) are
+        added after the router's pattern with every resource name in one regex, so reverse()
+        works as before.
+    """
+    def __init__(self):
+        self._resources = {} # Maps each resource_name to its resource
+        self._views = {} # Maps each resource_name to a dict of its wrapped views
+        self._resolvers = {} # Maps each resource_name to a resolver for its own URL patterns
+
+    def register(self, resource):
+        resource_name = resource._meta.resource_name
+        self._resources[resource_name] = resource
+        view_names = ['dispatch_list', 'dispatch_detail']
+        if isinstance(resource, BaseModelResource) and resource._meta.num_resource_ids == 1:
+            view_names += ['merge', 'unmerge', 'dispatch_set']
+        self._views[resource_name] = dict((name, resource.wrap_view(name)) for name in view_names)
+        self._resolvers[resource_name] = RegexURLResolver(r'^', resource.urls)
+
+    @property
+    def urls(self):
+        router_url = url(r"^(?P<path>(?:[^/]+/)+)$", self.route, name='api_router')
+        return patterns('', router_url, *self._get_named_urls())
+
+    @csrf_exempt
+    def route(self, request, path):
+        """ The view for every API request. Calls the resource's view for path. """
+        segments = path.rstrip('/').split('/')
+        resource_name = segments[0]
+        resource = self._resources.get(resource_name)
+        if resource is None:
+            raise Http404("No resource is named '{0}'.".format(resource_name))
+
+        view_name, kwargs = self._match(resource, segments[1:])
+        if view_name is not None and view_name in self._views[resource_name]:
+            return self._views[resource_name][view_name](request, resource_name=resource_name, **kwargs)
+
+        try:
+            view, args, kwargs = self._resolvers[resource_name].resolve(path)
+        except Resolver404:
+            raise Http404("No API endpoint matches '{0}'.".format(path))
+        return view(request, *args, **kwargs)
+
+    # Private methods
+    def _match(self, resource, segments):
+        """ Returns the name of the view and the kwargs for the segments after the resource name,
+            or (None, None) if they don't match one of the standard endpoints
+        """
+        num_resource_ids = resource._meta.num_resource_ids
+        if not segments:
+            return 'dispatch_list', {}
+        elif len(segments) == 1 and num_resource_ids == 1 and segments[0].isdigit():
+            return 'dispatch_detail', {'resource_id': segments[0]}
+        elif len(segments) == 2 and num_resource_ids == 2 and segments[0].isdigit() and segments[1].isdigit():
+            return 'dispatch_detail', {'resource_id_1': segments[0], 'resource_id_2': segments[1]}
+        elif num_resource_ids == 1 and len(segments) == 3 and segments[0] == 'merge' and \
+             segments[1].isdigit() and segments[2].isdigit():
+            return 'merge', {'resource_id_1': segments[1], 'resource_id_2': segments[2]}
+        elif num_resource_ids == 1 and len(segments) == 2 and segments[0] == 'unmerge' and segments[1].isdigit():
+            return 'unmerge', {'resource_id': segments[1]}
+        elif num_resource_ids == 1 and len(segments) == 2 and segments[0] == 'set' and \
+             _set_ids_regex.match(segments[1]):
+            return 'dispatch_set', {'resource_id_list': segments[1]}
+        return None, None
+
+    def _get_named_urls(self):
+        """ Returns the named URL patterns of the standard endpoints with the names of every
+            resource that has them in one alternation
+        """
+        all_names = sorted(self._resources)
+        single_id_names = [x for x in all_names if self._resources[x]._meta.num_resource_ids == 1]
+        two_id_names = [x for x in all_names if self._resources[x]._meta.num_resource_ids == 2]
+        merge_names = [x for x in single_id_names if 'merge' in self._views[x]]
+
+        urls = []
+        if all_names:
+            urls.append(url(r"^(?P<resource_name>{0})/$".format(_alternation(all_names)),
+                            self._get_named_view('dispatch_list'), name='api_dispatch_list'))
+        if single_id_names:
+            urls.append(url(r"^(?P<resource_name>{0})/(?P<resource_id>{1})/$".format(_alternation(single_id_names), num_regex),
+                            self._get_named_view('dispatch_detail'), name='api_dispatch_detail'))
+        if two_id_names:
+            urls.append(url(r"^(?P<resource_name>{0})/(?P<resource_id_1>{1})/(?P<resource_id_2>{1})/$".format(_alternation(two_id_names), num_regex),
+                            self._get_named_view('dispatch_detail'), name='api_dispatch_detail'))
+        if merge_names:
+            urls.append(url(r"^(?P<resource_name>{0})/merge/(?P<resource_id_1>{1})/(?P<resource_id_2>{1})/$".format(_alternation(merge_names), num_regex),
+                            self._get_named_view('merge'), name='api_merge'))
+            urls.append(url(r"^(?P<resource_name>{0})/unmerge/(?P<resource_id>{1})/$".format(_alternation(merge_names), num_regex),
+                            self._get_named_view('unmerge'), name='api_unmerge'))
+            urls.append(url(r"^(?P<resource_name>{0})/set/(?P<resource_id_list>{1}(?:;{1})*)/$".format(_alternation(merge_names), num_regex),
+                            self._get_named_view('dispatch_set'), name='api_dispatch_set'))
+        return urls
+
+    def _get_named_view(self, view_name):
+        """ Returns the view for a named pattern. The router's own pattern matches first, so
+            these are only used if the named patterns are included in a URLconf on their own.
+        """
+        @csrf_exempt
+        def view(request, resource_name, **kwargs):
+            return self._views[resource_name][view_name](request, resource_name=resource_name, **kwargs)
+        return view
+
+
+def _alternation(names):
+    return '|'.join([re.escape(name) for name in names])
+
+
+_set_ids_regex = re.compile(r"^{0}(?:;{0})*$".format(num_regex))
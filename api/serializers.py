@@ -1,9 +1,134 @@
 from __future__ import unicode_literals
 
+import datetime
+import decimal
+import types
+
+from django.core.serializers import json
+from django.utils import simplejson
 from tastypie.serializers import Serializer
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+COLUMNAR_LAYOUT = 'columnar'
+
+# The formats resources serialize to. MessagePack is only offered if it is installed.
+DEFAULT_FORMATS = ['json', 'msgpack'] if msgpack else ['json']
+
 
 class BaseSerializer(Serializer):
+    content_types = dict(Serializer.content_types, msgpack='application/x-msgpack')
+
+    def serialize(self, bundle, format='application/json', options={}):
+        """ Overrides Serializer's implementation so a list response's objects can be a
+            generator. JSON lists without a layout are encoded one object at a time, and every
+            other format gets the objects as a list.
+        """
+        if _has_object_generator(bundle) and not (format == self.content_types['json'] and not options.get('layout')):
+            bundle = dict(bundle, objects=list(bundle['objects']))
+        return super(BaseSerializer, self).serialize(bundle, format, options)
+
     def to_html(self, data, options=None):
         """ Overrides Serializer's implementation to return JSON by default """
         return self.to_json(data, options)
+
+    def to_json(self, data, options=None):
+        """ Overrides Serializer's implementation to encode a generator of objects one object
+            at a time, so each dehydrated object can be released once it is encoded. The output
+            is the same as if the objects were a list.
+
+            The encoded objects are joined into one string at the end, so the memory used still
+            grows with the number of objects, by the size of their JSON.
+        """
+        options = options or {}
+        if not _has_object_generator(data):
+            return super(BaseSerializer, self).to_json(data, options)
+
+        # Keys are encoded in sorted order to match sort_keys=True
+        items = []
+        for key in sorted(data.keys()):
+            if key == 'objects':
+                value = "[{0}]".format(', '.join(self._dumps(self.to_simple(obj, options)) for obj in data[key]))
+            else:
+                value = self._dumps(self.to_simple(data[key], options))
+            items.append("{0}: {1}".format(self._dumps(key), value))
+        return "{{{0}}}".format(', '.join(items))
+
+    def to_simple(self, data, options):
+        """ Overrides Serializer's implementation to encode lists of objects in columns
+            when options['layout'] is 'columnar'
+        """
+        if options.get('layout') == COLUMNAR_LAYOUT and isinstance(data, dict) and \
+           isinstance(data.get('objects'), list):
+            options = dict(options, layout=None)
+            return to_columnar(super(BaseSerializer, self).to_simple(data, options))
+        return super(BaseSerializer, self).to_simple(data, options)
+
+    def to_msgpack(self, data, options=None):
+        """ Given some Python data, produces MessagePack output. Dates, times and Decimals
+            are sent as strings, the same way they are in JSON.
+        """
+        options = options or {}
+        return msgpack.packb(_to_msgpack_types(self.to_simple(data, options)))
+
+    def from_msgpack(self, content):
+        """ Given some MessagePack data, returns a Python dictionary of the decoded data """
+        try:
+            return msgpack.unpackb(content, raw=False)
+        except TypeError:
+            # msgpack < 0.5.2 decodes strings with the encoding argument instead of raw
+            return msgpack.unpackb(content, encoding='utf-8')
+
+    def _dumps(self, data):
+        return simplejson.dumps(data, cls=json.DjangoJSONEncoder, sort_keys=True)
+
+
+_json_encoder = json.DjangoJSONEncoder()
+
+
+def _to_msgpack_types(data):
+    """ Converts the values in simplified data that MessagePack can't pack the way the JSON
+        encoder does
+    """
+    if isinstance(data, dict):
+        return dict((key, _to_msgpack_types(value)) for key, value in data.iteritems())
+    if isinstance(data, (list, tuple)):
+        return [_to_msgpack_types(value) for value in data]
+    if isinstance(data, (datetime.datetime, datetime.date, datetime.time, decimal.Decimal)):
+        return _json_encoder.default(data)
+    return data
+
+
+def _has_object_generator(data):
+    return isinstance(data, dict) and isinstance(data.get('objects'), types.GeneratorType)
+
+
+def to_columnar(data):
+    """ Takes a simplified list response and returns it with the objects encoded as columns
+        and rows, so each key is only sent once:
+
+            {'meta': {...}, 'columns': ['id', 'name'], 'rows': [[1, 'a'], [2, 'b']]}
+
+        Columns are sorted by name. Keys that an object doesn't have are None in its row.
+    """
+    objects = data.pop('objects')
+    columns = set()
+    for obj in objects:
+        columns.update(obj.keys())
+    columns = sorted(columns)
+
+    data['columns'] = columns
+    data['rows'] = [[obj.get(column) for column in columns] for obj in objects]
+    return data
+
+
+def from_columnar(data):
+    """ Takes a list response encoded with to_columnar and returns it with the objects as dicts """
+    data = dict(data)
+    columns = data.pop('columns')
+    data['objects'] = [dict(zip(columns, row)) for row in data.pop('rows')]
+    return data
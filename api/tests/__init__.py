@@ -0,0 +1,15 @@
+""" Tests for the API extensions.
+
+    Usage:
+        python -m unittest discover -s api/tests -t .
+
+    The tests run against new SQLite databases in a temporary directory, with the settings in
+    api.tests.utils.TEST_SETTINGS unless Django is already configured. trackable_object and
+    oauth2app have to be installed.
+
+    api.tests.support holds the synthetic models and resources the tests run against. It is
+    also used by the api_loadtest command, so importing this package doesn't touch a database.
+"""
+from api.tests.utils import configure_settings
+
+configure_settings()
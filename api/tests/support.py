@@ -0,0 +1,168 @@
+""" Synthetic models and resources that the tests and the api_loadtest command run against.
+
+    The models' tables aren't made by syncdb. create_synthetic_tables makes them in a test
+    database, and install_urls serves the resources from API_PREFIX.
+"""
+from __future__ import unicode_literals
+
+import sys
+import types
+
+from django import forms
+from django.conf import settings
+from django.conf.urls.defaults import include, patterns, url
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.core.urlresolvers import clear_url_caches
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.http import Http404
+from tastypie import fields
+
+from api.fields import BaseForeignKey
+from api.forms import BaseModelResourceForm, BaseModelResourceListForm
+from api.resources.generic import BaseModelResource
+from api.router import ApiRouter
+from trackable_object.models import TrackableObject
+
+
+API_PREFIX = '/loadtest/' # The path the synthetic resources are served from
+URLCONF_NAME = str('api_loadtest_urls')
+TOKEN_PREFIX = 'loadtest-'
+
+
+# Synthetic models. Their tables are only created in the test database.
+class LoadTestCategory(TrackableObject):
+    name = models.CharField(max_length=100)
+
+    objects = type(TrackableObject._default_manager)() # Lists are filtered with filter_view_perms
+
+    class Meta:
+        app_label = 'api'
+        db_table = 'api_loadtest_category'
+
+
+class LoadTestItem(TrackableObject):
+    name = models.CharField(max_length=100)
+    info = models.TextField()
+    rank = models.IntegerField(default=0)
+    category = models.ForeignKey(LoadTestCategory, related_name='loadtest_items')
+
+    objects = type(TrackableObject._default_manager)()
+
+    class Meta:
+        app_label = 'api'
+        db_table = 'api_loadtest_item'
+
+
+class LoadTestItemCreateForm(BaseModelResourceForm):
+    name = forms.CharField(max_length=100)
+    info = forms.CharField(max_length=100000)
+    rank = forms.IntegerField(required=False)
+    category_id = forms.IntegerField()
+
+
+class LoadTestResource(BaseModelResource):
+    def get_acceptable_scopes(self, request):
+        return []
+
+
+class LoadTestCategoryResource(LoadTestResource):
+    name = fields.CharField(attribute='name')
+
+    class Meta(BaseModelResource.Meta):
+        resource_name = 'loadtest_category'
+        urlconf = URLCONF_NAME # Installed by install_urls
+        queryset = LoadTestCategory.objects.all()
+        list_validation_form = BaseModelResourceListForm
+
+
+class LoadTestItemResource(LoadTestResource):
+    name = fields.CharField(attribute='name')
+    info = fields.CharField(attribute='info')
+    rank = fields.IntegerField(attribute='rank', default=0)
+    category_id = fields.IntegerField(attribute='category_id')
+    category = BaseForeignKey(LoadTestCategoryResource, 'category', readonly=True)
+
+    class Meta(BaseModelResource.Meta):
+        resource_name = 'loadtest_item'
+        urlconf = URLCONF_NAME
+        queryset = LoadTestItem.objects.all()
+        select_related = ['category']
+        list_validation_form = BaseModelResourceListForm
+        create_validation_form = LoadTestItemCreateForm
+
+
+def item_resource(resource_class=LoadTestItemResource, **options):
+    """ Returns a subclass of resource_class with the Meta options in options.
+
+        Usage:
+            CachedItemResource = item_resource(cache_anonymous_lists=True)
+    """
+    meta = type(str('Meta'), (resource_class.Meta,), options)
+    return type(resource_class.__name__, (resource_class,), {'Meta': meta, '__module__': __name__})
+
+
+class StubAuthenticator(object):
+    """ Used in place of oauth2app's Authenticator. The access token is 'loadtest-<user id>'. """
+    def __init__(self, scope=None):
+        self.user = None
+
+    def validate(self, request):
+        token = request.META.get('HTTP_AUTHORIZATION', '').replace('Bearer', '', 1).strip()
+        try:
+            if not token.startswith(TOKEN_PREFIX):
+                raise ValueError
+            self.user = User.objects.get(id=int(token[len(TOKEN_PREFIX):]))
+        except (ValueError, User.DoesNotExist):
+            raise Exception("Invalid access token.")
+
+
+def get_token(user_id):
+    """ Returns the Authorization header StubAuthenticator accepts for the user with user_id """
+    return 'Bearer {0}{1}'.format(TOKEN_PREFIX, user_id)
+
+
+def _reverse_only(request, **kwargs):
+    """ The view of the patterns install_urls only adds for reverse() """
+    raise Http404
+
+
+def install_urls(resources=None):
+    """ Serves resources (the synthetic category and item resources by default) from
+        API_PREFIX through an ApiRouter. Returns the router.
+
+        The list and detail URIs of any resource name under API_PREFIX can be reversed, so
+        resources made with item_resource have URIs without being registered.
+    """
+    router = ApiRouter()
+    for resource in resources or [LoadTestCategoryResource(), LoadTestItemResource()]:
+        router.register(resource)
+
+    prefix = r'^{0}'.format(API_PREFIX.lstrip('/'))
+    urlconf = types.ModuleType(URLCONF_NAME)
+    urlconf.urlpatterns = patterns('',
+        url(prefix, include(router.urls)),
+        # Only used by reverse(), since the router's pattern matches every path under the prefix
+        url(prefix + r'(?P<resource_name>\w+)/$', _reverse_only, name='api_dispatch_list'),
+        url(prefix + r'(?P<resource_name>\w+)/(?P<resource_id>\d+)/$', _reverse_only, name='api_dispatch_detail'),
+    )
+    sys.modules[URLCONF_NAME] = urlconf
+    settings.ROOT_URLCONF = URLCONF_NAME
+    clear_url_caches()
+    return router
+
+
+def create_synthetic_tables(using=DEFAULT_DB_ALIAS):
+    """ Creates the tables of the synthetic models in the database using. References to tables
+        outside the synthetic models are left out. They aren't needed to read or write.
+    """
+    database = connections[using]
+    style = no_style()
+    cursor = database.cursor()
+    known_models = set()
+    for model in (LoadTestCategory, LoadTestItem):
+        statements, pending_references = database.creation.sql_create_model(model, style, known_models)
+        for statement in statements + database.creation.sql_indexes_for_model(model, style):
+            cursor.execute(statement)
+        known_models.add(model)
+    transaction.commit_unless_managed(using=using)
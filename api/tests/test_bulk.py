@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+
+from django.db import IntegrityError
+
+from api.tests.support import LoadTestCategory, LoadTestItem, LoadTestItemResource, item_resource
+from api.tests.utils import ApiTestCase
+
+
+class BulkItemResource(item_resource(bulk_allowed=True)):
+    def is_authorized(self, request, object=None):
+        """ Lets anyone create objects, but nobody edit them """
+        if object and request.META.get('REQUEST_METHOD') == 'PUT':
+            return False
+        return super(BulkItemResource, self).is_authorized(request, object)
+
+
+class FailingItemResource(item_resource(bulk_allowed=True)):
+    def obj_create(self, bundle, **kwargs):
+        """ Fails after the object was saved when it is named 'Fail' """
+        bundle = super(FailingItemResource, self).obj_create(bundle, **kwargs)
+        if bundle.obj.name == 'Fail':
+            raise IntegrityError("The object couldn't be saved.")
+        return bundle
+
+
+class BulkWriteTest(ApiTestCase):
+    def setUp(self):
+        super(BulkWriteTest, self).setUp()
+        self.user = self.create_user('bulk')
+        request = self.fake_request(self.user)
+        self.category = LoadTestCategory(name='Bulk').submit(request)
+        self.item = LoadTestItem(name='Existing', info='<p>Hi</p>', category=self.category).submit(request)
+
+    def post(self, resource_class, items, atomic=False):
+        path = '/loadtest/loadtest_item/?atomic=true' if atomic else '/loadtest/loadtest_item/'
+        return self.dispatch(resource_class, 'list', path=path, method='post', data=items, user=self.user)
+
+    def get_names(self):
+        return set(LoadTestItem.objects.filter(category=self.category).values_list('name', flat=True))
+
+    def test_bulk_writes_are_off_by_default(self):
+        response = self.post(LoadTestItemResource, [{'name': 'New', 'info': '<p>New</p>', 'category_id': self.category.id}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_mixed_batch(self):
+        items = [{'name': 'Created', 'info': '<p>New</p>', 'category_id': self.category.id},
+                 {'info': '<p>No name</p>', 'category_id': self.category.id},
+                 {'id': 999999, 'name': 'Missing', 'info': '<p>Missing</p>', 'category_id': self.category.id},
+                 {'id': self.item.id, 'name': 'Edited', 'info': '<p>Edited</p>', 'category_id': self.category.id}]
+        content = self.get_content(self.post(BulkItemResource, items), 200) # Only atomic batches fail as a whole
+
+        self.assertEqual(content['meta']['created'], 1)
+        self.assertEqual(content['meta']['failed'], 3)
+        self.assertEqual([x['status'] for x in content['objects']], [201, 400, 404, 401])
+        self.assertTrue(LoadTestItem.objects.filter(id=content['objects'][0]['id'], name='Created').exists())
+
+        # The edit is refused with the same message as a PUT to the detail endpoint
+        self.assertEqual(content['objects'][3]['error_message'], "You are not authorized to edit this object")
+        self.assertEqual(LoadTestItem.objects.get(id=self.item.id).name, 'Existing')
+
+    def test_database_error_fails_only_its_item(self):
+        items = [{'name': 'First', 'info': '<p>New</p>', 'category_id': self.category.id},
+                 {'name': 'Fail', 'info': '<p>New</p>', 'category_id': self.category.id},
+                 {'name': 'Last', 'info': '<p>New</p>', 'category_id': self.category.id}]
+        content = self.get_content(self.post(FailingItemResource, items), 200)
+
+        self.assertEqual([x['status'] for x in content['objects']], [201, 400, 201])
+        self.assertEqual(content['objects'][1]['error_message'], "The object couldn't be saved.")
+        self.assertEqual(self.get_names(), set(['Existing', 'First', 'Last']))
+
+    def test_database_error_rolls_back_an_atomic_batch(self):
+        items = [{'name': 'First', 'info': '<p>New</p>', 'category_id': self.category.id},
+                 {'name': 'Fail', 'info': '<p>New</p>', 'category_id': self.category.id}]
+        content = self.get_content(self.post(FailingItemResource, items, atomic=True), 400)
+
+        self.assertEqual([x['status'] for x in content['objects']], [None, 400])
+        self.assertEqual(self.get_names(), set(['Existing']))
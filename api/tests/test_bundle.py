@@ -0,0 +1,23 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from tastypie.bundle import Bundle
+
+from api.bundle import ListBundle
+from api.serializers import BaseSerializer
+
+
+class ListBundleTest(unittest.TestCase):
+    def test_is_a_bundle(self):
+        bundle = ListBundle(obj=1, data={'id': 1})
+        self.assertTrue(isinstance(bundle, Bundle))
+        self.assertEqual(bundle.request, None)
+        self.assertEqual(BaseSerializer().to_simple({'objects': [bundle]}, {}), {'objects': [{'id': 1}]})
+
+    def test_other_attributes_can_be_set(self):
+        bundle = ListBundle(obj=1)
+        self.assertEqual(bundle.__dict__, {}) # Nothing is kept in it until it is needed
+        bundle.errors = {'name': ['Required']}
+        self.assertEqual(bundle.errors, {'name': ['Required']})
+        self.assertEqual(bundle.__dict__, {'errors': {'name': ['Required']}})
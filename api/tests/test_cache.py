@@ -0,0 +1,37 @@
+from __future__ import unicode_literals
+
+from api.cache import get_generation
+from api.resources.generic import _cache_models, watch_cached_resources
+from api.tests.support import LoadTestCategory, LoadTestItem, item_resource
+from api.tests.utils import ApiTestCase
+
+
+CachedItemResource = item_resource(resource_name='loadtest_cached_list', cache_anonymous_lists=True)
+
+
+class ResponseCacheTest(ApiTestCase):
+    def setUp(self):
+        super(ResponseCacheTest, self).setUp()
+        self.user = self.create_user('cache')
+        self.category = LoadTestCategory(name='Cached').submit(self.fake_request(self.user))
+        LoadTestItem(name='Cached', info='<p>Hi</p>', category=self.category).submit(self.fake_request(self.user))
+
+    def get(self):
+        return self.dispatch(CachedItemResource, 'list')
+
+    def test_related_models_are_watched_without_a_request(self):
+        WatchedItemResource = item_resource(resource_name='loadtest_watched_item', cache_anonymous_lists=True)
+        watch_cached_resources()
+        self.assertEqual(_cache_models[WatchedItemResource], [LoadTestItem, LoadTestCategory])
+
+        generation = get_generation(LoadTestCategory)
+        LoadTestCategory(name='Watched').submit(self.fake_request(self.user))
+        self.assertNotEqual(get_generation(LoadTestCategory), generation)
+
+    def test_writing_a_related_model_invalidates_the_cached_list(self):
+        self.assertFalse(self.get().has_header('X-Api-Cache'))
+        self.assertEqual(self.get()['X-Api-Cache'], 'hit')
+
+        LoadTestCategory(name='New').submit(self.fake_request(self.user))
+        self.assertFalse(self.get().has_header('X-Api-Cache'))
+        self.assertEqual(self.get()['X-Api-Cache'], 'hit')
@@ -0,0 +1,112 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from django.db import connection
+from django.http import HttpResponse
+
+from api.coalesce import copy_response, single_flight
+from api.resources.generic import PER_REQUEST_HEADERS
+from api.tests.support import LoadTestCategory, LoadTestItem, get_token, item_resource
+from api.tests.utils import ApiTestCase, get_request
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_identical_calls_share_a_result(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def leader_func():
+            calls.append('leader')
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        leader_result = []
+        leader = threading.Thread(target=lambda: leader_result.append(single_flight('key', leader_func, 5)))
+        leader.start()
+        started.wait(5)
+
+        follower_result = []
+        follower = threading.Thread(target=lambda: follower_result.append(
+            single_flight('key', lambda: calls.append('follower') or 'other', 5)))
+        follower.start()
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(calls, ['leader'])
+        self.assertEqual(leader_result, [('result', False)])
+        self.assertEqual(follower_result, [('result', True)])
+
+    def test_other_keys_arent_shared(self):
+        self.assertEqual(single_flight(('list', 1), lambda: 'first', 5), ('first', False))
+        self.assertEqual(single_flight(('list', 2), lambda: 'second', 5), ('second', False))
+
+
+class CopyResponseTest(unittest.TestCase):
+    def test_per_request_headers_arent_copied(self):
+        response = HttpResponse('{"objects": []}', content_type='application/json', status=200)
+        response['X-RateLimit-Remaining'] = 3
+        response['Server-Timing'] = 'query;dur=5'
+        response['X-Query-Count'] = '4'
+        copy = copy_response(response, exclude_headers=PER_REQUEST_HEADERS)
+
+        self.assertEqual(copy.content, response.content)
+        self.assertEqual(copy['Content-Type'], 'application/json')
+        for header in ('X-RateLimit-Remaining', 'Server-Timing', 'X-Query-Count'):
+            self.assertFalse(copy.has_header(header))
+
+
+CoalescedItemResource = item_resource(resource_name='loadtest_coalesced_item', coalesce_requests=True)
+
+
+class SlowCoalescedItemResource(CoalescedItemResource):
+    def obj_get_list(self, request, **kwargs):
+        time.sleep(0.2) # Lets the other requests start while this one is in flight
+        return super(SlowCoalescedItemResource, self).obj_get_list(request, **kwargs)
+
+    def alter_list_data_to_serialize(self, request, data):
+        """ Adds the user from the resource's state, which is what other requests could overwrite """
+        data['meta']['viewer'] = self.request.user.username
+        return data
+
+
+class ConcurrentRequestTest(ApiTestCase):
+    def setUp(self):
+        super(ConcurrentRequestTest, self).setUp()
+        self.users = [self.create_user('coalesce{0}'.format(i)) for i in range(2)]
+        request = self.fake_request(self.users[0])
+        category = LoadTestCategory(name='Coalesce').submit(request)
+        for i in range(3):
+            LoadTestItem(name='Coalesced {0}'.format(i), info='<p>Hi</p>', category=category).submit(request)
+
+    def test_each_request_gets_its_own_response(self):
+        # Like a URLconf, every request goes through the views of one shared instance
+        view = SlowCoalescedItemResource().wrap_view('dispatch_list')
+        cases = [(user, limit) for user in self.users for limit in (1, 2) for repeat in range(3)]
+        responses = [None] * len(cases)
+
+        def get(index):
+            user, limit = cases[index]
+            request = get_request('/loadtest/loadtest_coalesced_item/', {'limit': limit})
+            request.META['HTTP_AUTHORIZATION'] = get_token(user.id)
+            try:
+                responses[index] = view(request)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=get, args=(i,)) for i in range(len(cases))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for (user, limit), response in zip(cases, responses):
+            content = self.get_content(response)
+            self.assertEqual(content['meta']['viewer'], user.username)
+            self.assertEqual(content['meta']['limit'], limit)
+            self.assertEqual(len(content['objects']), limit)
+        self.assertTrue([x for x in responses if x.has_header('X-Api-Coalesced')])
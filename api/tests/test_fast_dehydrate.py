@@ -0,0 +1,86 @@
+from __future__ import unicode_literals
+
+import simplejson
+from django.db import models
+from tastypie import fields
+
+from api.tests.support import LoadTestCategory, LoadTestItem, LoadTestItemResource, LoadTestResource, item_resource
+from api.tests.utils import ApiTestCase
+
+
+class TimedItemResource(LoadTestItemResource):
+    time_created = fields.DateTimeField(readonly=True)
+    time_last_updated = fields.DateTimeField(readonly=True)
+
+    class Meta(LoadTestItemResource.Meta):
+        resource_name = 'loadtest_timed_item'
+
+
+FastItemResource = item_resource(TimedItemResource, fast_dehydrate=True)
+
+
+class CommaSeparatedField(models.TextField):
+    """ Stored as text, but the model's attribute is a list """
+    __metaclass__ = models.SubfieldBase
+
+    def to_python(self, value):
+        if isinstance(value, list):
+            return value
+        return value.split(',') if value else []
+
+    def get_prep_value(self, value):
+        return ','.join(value)
+
+
+class TaggedItem(models.Model):
+    name = models.CharField(max_length=100)
+    tags = CommaSeparatedField()
+
+    class Meta:
+        app_label = 'api'
+        db_table = 'api_loadtest_tagged_item'
+        managed = False
+
+
+class TaggedItemResource(LoadTestResource):
+    name = fields.CharField(attribute='name')
+    tags = fields.CharField(attribute='tags')
+
+    class Meta(LoadTestResource.Meta):
+        resource_name = 'loadtest_tagged_item'
+        queryset = TaggedItem.objects.all()
+        fast_dehydrate = True
+
+
+class FastDehydrateTest(ApiTestCase):
+    def setUp(self):
+        super(FastDehydrateTest, self).setUp()
+        self.user = self.create_user('fast')
+        request = self.fake_request(self.user)
+        category = LoadTestCategory(name='Fast').submit(request)
+        items = [LoadTestItem(name='Plain', info='<p>Hi</p>', category=category),
+                 LoadTestItem(name='Tom & "Jerry"', info="<script>alert('x')</script>", rank=3, category=category)]
+        for item in items:
+            item.submit(request)
+
+    def get_page(self, resource):
+        params = {'fields': '[id,name,info,rank,category_id,time_created,time_last_updated]', 'limit': 10}
+        return self.get_content(self.dispatch(resource, 'list', params=params, user=self.user))
+
+    def test_same_page_as_full_dehydrate(self):
+        resource = FastItemResource()
+        fast = self.get_page(resource)
+        self.assertTrue(resource._get_fast_dehydrate_plan(LoadTestItem.objects.all()))
+        slow = self.get_page(TimedItemResource())
+
+        self.assertTrue(fast['objects'])
+        self.assertEqual(simplejson.dumps(fast['objects'], sort_keys=True), simplejson.dumps(slow['objects'], sort_keys=True))
+        first = fast['objects'][0]
+        for field_name in ('resource_uri', 'category_id', 'time_created', 'time_last_updated'):
+            self.assertTrue(first[field_name], field_name)
+        self.assertTrue(first['resource_uri'].startswith('https://api.example.com/loadtest/loadtest_timed_item/'))
+
+    def test_converted_columns_arent_read_directly(self):
+        resource = TaggedItemResource()
+        self.assertTrue(resource._get_fast_dehydrate_step('name', resource.fields['name']))
+        self.assertEqual(resource._get_fast_dehydrate_step('tags', resource.fields['tags']), None)
@@ -0,0 +1,22 @@
+from __future__ import unicode_literals
+
+from api.pool import pooled_resource
+from api.tests.support import LoadTestItemResource
+from api.tests.utils import ApiTestCase
+
+
+class PooledResourceTest(ApiTestCase):
+    def test_field_state_is_reset(self):
+        with pooled_resource(LoadTestItemResource) as resource:
+            resource.expand_fields = {'category': ['name']}
+            resource.fields['category'].expand = True
+            resource.fields['category'].nested_fields = ['name']
+            resource.fields['extra'] = resource.fields['name']
+            first = resource
+
+        with pooled_resource(LoadTestItemResource) as resource:
+            self.assertTrue(resource is first)
+            self.assertFalse(hasattr(resource, 'expand_fields'))
+            self.assertFalse(resource.fields['category'].expand)
+            self.assertEqual(resource.fields['category'].nested_fields, None)
+            self.assertFalse('extra' in resource.fields)
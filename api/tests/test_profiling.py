@@ -0,0 +1,34 @@
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+import unittest
+
+import simplejson
+from django.conf import settings
+from django.http import HttpResponse
+
+from api.profiling import RequestProfiler
+from api.tests.utils import get_request
+
+
+class RequestProfilerTest(unittest.TestCase):
+    def setUp(self):
+        settings.API_PROFILE_DIR = tempfile.mkdtemp(prefix='api_profiles')
+
+    def tearDown(self):
+        shutil.rmtree(settings.API_PROFILE_DIR)
+        del settings.API_PROFILE_DIR
+
+    def test_capture_has_memory_data(self):
+        profiler = RequestProfiler().start()
+        objects = [{'id': i} for i in range(1000)]
+        path = profiler.save(get_request('/loadtest/loadtest_item/'), HttpResponse(), 'loadtest_item', 'list')
+
+        with open(path[:-len('.prof')] + '.json') as f:
+            memory = simplejson.load(f)['memory']
+        self.assertTrue(memory['max_rss_delta'] >= 0)
+        self.assertEqual(len(memory['gc_counts_before']), 3)
+        self.assertEqual(len(memory['gc_counts_after']), 3)
+        self.assertTrue(memory['objects_after'] > memory['objects_before'])
+        del objects
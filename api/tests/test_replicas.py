@@ -0,0 +1,40 @@
+from __future__ import unicode_literals
+
+from api.tests.support import LoadTestCategory, LoadTestItem, item_resource
+from api.tests.utils import ApiTestCase
+
+
+ReplicaItemResource = item_resource(read_db_alias='replica')
+
+
+class ReadReplicaTest(ApiTestCase):
+    """ The 'replica' database never gets the primary's writes, so a read shows which
+        database it was sent to
+    """
+    def setUp(self):
+        super(ReadReplicaTest, self).setUp()
+        self.user = self.create_user('replicas')
+        self.category = LoadTestCategory(name='Replicas').submit(self.fake_request(self.user))
+
+    def get_names(self):
+        content = self.get_content(self.dispatch(ReplicaItemResource, 'list', user=self.user))
+        return [x['name'] for x in content['objects']]
+
+    def post(self, data):
+        return self.dispatch(ReplicaItemResource, 'list', method='post', data=data, user=self.user)
+
+    def test_reads_go_to_the_replica(self):
+        LoadTestItem(name='Primary only', info='<p>Hi</p>', category=self.category).submit(self.fake_request(self.user))
+        self.assertFalse(LoadTestItem.objects.using('replica').exists())
+        self.assertEqual(self.get_names(), [])
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        response = self.post({'name': 'Written', 'info': '<p>Hi</p>', 'category_id': self.category.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Written', self.get_names())
+
+    def test_failed_writes_dont_stick(self):
+        response = self.post({'info': '<p>No name</p>', 'category_id': self.category.id})
+        self.assertEqual(response.status_code, 400)
+        LoadTestItem(name='Primary only', info='<p>Hi</p>', category=self.category).submit(self.fake_request(self.user))
+        self.assertEqual(self.get_names(), [])
@@ -0,0 +1,103 @@
+from __future__ import unicode_literals
+
+import sys
+import types
+
+import simplejson
+from django.conf.urls.defaults import include, patterns, url
+from django.core.urlresolvers import reverse
+from django.http import Http404, HttpResponse
+
+from api.router import ApiRouter
+from api.tests.support import LoadTestItemResource, item_resource
+from api.tests.utils import ApiTestCase, get_request
+
+
+URLCONF_NAME = str('api_router_test_urls')
+
+
+class RecordingResource(LoadTestItemResource):
+    """ Responds with the name of the view that was called and its kwargs """
+    def respond(self, view_name, kwargs):
+        return HttpResponse(simplejson.dumps({'view': view_name, 'kwargs': kwargs}), content_type='application/json')
+
+    def dispatch_list(self, request, **kwargs):
+        return self.respond('dispatch_list', kwargs)
+
+    def dispatch_detail(self, request, **kwargs):
+        return self.respond('dispatch_detail', kwargs)
+
+    def merge(self, request, **kwargs):
+        return self.respond('merge', kwargs)
+
+    def unmerge(self, request, **kwargs):
+        return self.respond('unmerge', kwargs)
+
+    def dispatch_set(self, request, **kwargs):
+        return self.respond('dispatch_set', kwargs)
+
+    def search(self, request, **kwargs):
+        return self.respond('search', kwargs)
+
+    def override_urls(self):
+        return super(RecordingResource, self).override_urls() + [
+            url(r"^(?P<resource_name>{0})/search/$".format(self._meta.resource_name), self.wrap_view('search')),
+        ]
+
+    class Meta(LoadTestItemResource.Meta):
+        resource_name = 'loadtest_router_item'
+
+
+PairResource = item_resource(RecordingResource, resource_name='loadtest_router_pair', num_resource_ids=2)
+
+
+class ApiRouterTest(ApiTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(ApiRouterTest, cls).setUpClass()
+        cls.router = ApiRouter()
+        cls.router.register(RecordingResource())
+        cls.router.register(PairResource())
+        urlconf = types.ModuleType(URLCONF_NAME)
+        urlconf.urlpatterns = patterns('', url(r'^v1/', include(cls.router.urls)))
+        sys.modules[URLCONF_NAME] = urlconf
+
+    def route(self, path):
+        response = self.router.route(get_request('/v1/' + path), path)
+        return self.get_content(response)
+
+    def assertRoutes(self, path, view_name, **kwargs):
+        kwargs['resource_name'] = path.split('/')[0]
+        self.assertEqual(self.route(path), {'view': view_name, 'kwargs': kwargs})
+
+    def test_standard_endpoints(self):
+        self.assertRoutes('loadtest_router_item/', 'dispatch_list')
+        self.assertRoutes('loadtest_router_item/5/', 'dispatch_detail', resource_id='5')
+        self.assertRoutes('loadtest_router_pair/5/6/', 'dispatch_detail', resource_id_1='5', resource_id_2='6')
+        self.assertRoutes('loadtest_router_item/merge/5/6/', 'merge', resource_id_1='5', resource_id_2='6')
+        self.assertRoutes('loadtest_router_item/unmerge/5/', 'unmerge', resource_id='5')
+        self.assertRoutes('loadtest_router_item/set/5;6;7/', 'dispatch_set', resource_id_list='5;6;7')
+
+    def test_override_urls(self):
+        self.assertRoutes('loadtest_router_item/search/', 'search')
+
+    def test_unknown_paths_raise_404(self):
+        for path in ('unknown/', 'unknown/5/', 'loadtest_router_item/5/6/', 'loadtest_router_pair/5/',
+                     'loadtest_router_pair/merge/5/6/', 'loadtest_router_item/set/5;a/', 'loadtest_router_item/other/'):
+            self.assertRaises(Http404, self.router.route, get_request('/v1/' + path), path)
+
+    def test_reverse(self):
+        def reverse_path(url_name, **kwargs):
+            return reverse(url_name, kwargs=kwargs, urlconf=URLCONF_NAME)
+
+        self.assertEqual(reverse_path('api_dispatch_list', resource_name='loadtest_router_item'), '/v1/loadtest_router_item/')
+        self.assertEqual(reverse_path('api_dispatch_detail', resource_name='loadtest_router_item', resource_id=5),
+                         '/v1/loadtest_router_item/5/')
+        self.assertEqual(reverse_path('api_dispatch_detail', resource_name='loadtest_router_pair', resource_id_1=5, resource_id_2=6),
+                         '/v1/loadtest_router_pair/5/6/')
+        self.assertEqual(reverse_path('api_merge', resource_name='loadtest_router_item', resource_id_1=5, resource_id_2=6),
+                         '/v1/loadtest_router_item/merge/5/6/')
+        self.assertEqual(reverse_path('api_unmerge', resource_name='loadtest_router_item', resource_id=5),
+                         '/v1/loadtest_router_item/unmerge/5/')
+        self.assertEqual(reverse_path('api_dispatch_set', resource_name='loadtest_router_item', resource_id_list='5;6'),
+                         '/v1/loadtest_router_item/set/5;6/')
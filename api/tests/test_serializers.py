@@ -0,0 +1,37 @@
+from __future__ import unicode_literals
+
+import datetime
+import decimal
+import unittest
+
+import simplejson
+
+from api.serializers import BaseSerializer, msgpack
+from api.tests.support import LoadTestItemResource
+from api.tests.utils import ApiTestCase, get_request
+from api.utils import access_resource
+
+
+class MsgpackTest(unittest.TestCase):
+    @unittest.skipIf(msgpack is None, "msgpack isn't installed")
+    def test_round_trip_matches_json(self):
+        serializer = BaseSerializer(formats=['json', 'msgpack'])
+        data = {'meta': {'total_count': 1},
+                'objects': [{'id': 1,
+                             'time_last_updated': datetime.datetime(2012, 3, 4, 5, 6, 7, 890000),
+                             'date': datetime.date(2012, 3, 4),
+                             'price': decimal.Decimal('1.50')}]}
+
+        packed = serializer.serialize(data, 'application/x-msgpack')
+        unpacked = serializer.deserialize(packed, 'application/x-msgpack')
+        self.assertEqual(unpacked, simplejson.loads(serializer.serialize(data, 'application/json')))
+        self.assertEqual(unpacked['objects'][0]['time_last_updated'], '2012-03-04T05:06:07.890000')
+
+
+class ColumnarAccessTest(ApiTestCase):
+    def test_params_are_not_changed(self):
+        user = self.create_user('columnar')
+        params = {'limit': 5}
+        data = access_resource(LoadTestItemResource, get_request(user=user), params=params, columnar=True)
+        self.assertEqual(params, {'limit': 5})
+        self.assertIn('columns', data)
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+from api.tests.support import LoadTestCategory, LoadTestItem, item_resource
+from api.tests.utils import ApiTestCase
+
+
+class PrivateLoadTestItem(LoadTestItem):
+    """ Objects named 'Private' can't be viewed by anyone """
+    def has_view_perm(self, user):
+        return self.name != 'Private' and super(PrivateLoadTestItem, self).has_view_perm(user)
+
+    class Meta:
+        app_label = 'api'
+        proxy = True
+
+
+SetItemResource = item_resource(resource_name='loadtest_set_item', queryset=PrivateLoadTestItem.objects.all(),
+                                max_set_ids=5)
+
+
+class SetEndpointTest(ApiTestCase):
+    def setUp(self):
+        super(SetEndpointTest, self).setUp()
+        self.user = self.create_user('set')
+        request = self.fake_request(self.user)
+        category = LoadTestCategory(name='Set').submit(request)
+        self.found, self.removed, self.private = [
+            LoadTestItem(name=name, info='<p>Hi</p>', category=category).submit(request)
+            for name in ('Found', 'Removed', 'Private')]
+        self.removed.remove(self.fake_request(self.user))
+        self.missing_id = LoadTestItem.objects.order_by('-id')[0].id + 1000
+
+    def get_set(self, resource_id_list):
+        path = '/loadtest/loadtest_set_item/set/{0}/'.format(resource_id_list)
+        return self.dispatch(SetItemResource, 'set', path=path, user=self.user, resource_id_list=resource_id_list)
+
+    def get_detail(self, resource_id):
+        path = '/loadtest/loadtest_set_item/{0}/'.format(resource_id)
+        return self.dispatch(SetItemResource, 'detail', path=path, user=self.user, resource_id=str(resource_id))
+
+    def test_errors_match_the_detail_endpoint(self):
+        ids = [self.found.id, self.missing_id, self.removed.id, self.private.id]
+        content = self.get_content(self.get_set(';'.join(str(x) for x in ids + [self.found.id])))
+
+        self.assertEqual([x['id'] for x in content['objects']], [self.found.id])
+        self.assertEqual(sorted(content['errors']), sorted(str(x) for x in ids[1:]))
+        for resource_id, status_code in zip(ids[1:], (404, 410, 403)):
+            error = content['errors'][str(resource_id)]
+            self.assertEqual(error['status'], status_code)
+            detail = self.get_content(self.get_detail(resource_id), status_code)
+            self.assertEqual(error['error_message'], detail['error_message'])
+
+    def test_max_set_ids(self):
+        self.get_content(self.get_set(';'.join([str(self.found.id)] * 5)))
+        content = self.get_content(self.get_set(';'.join([str(self.found.id)] * 6)), 400)
+        self.assertEqual(content['error_message'],
+                         "Too many ids were requested. The max number of ids per request is 5.")
+
+    def test_ids_must_be_integers(self):
+        for resource_id_list in ('{0};abc'.format(self.found.id), '-1', '1.5'):
+            content = self.get_content(self.get_set(resource_id_list), 400)
+            self.assertTrue(content['error_message'].startswith("Invalid resource lookup data provided."))
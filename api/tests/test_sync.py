@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+
+import datetime
+
+from api.tests.support import LoadTestCategory, LoadTestItem, LoadTestItemResource
+from api.tests.utils import ApiTestCase
+
+
+# Far enough ahead that the objects other tests make are never part of a sync
+CHANGE_TIME = datetime.datetime(2100, 1, 1, 12, 0, 0)
+CHANGED_SINCE = '2099-12-31T00:00:00+00:00'
+
+
+class SyncItemResource(LoadTestItemResource):
+    def apply_authorization_limits(self, request, object_list):
+        """ Hides the objects named 'Hidden' from everyone """
+        object_list = super(SyncItemResource, self).apply_authorization_limits(request, object_list)
+        return object_list.exclude(name='Hidden')
+
+    class Meta(LoadTestItemResource.Meta):
+        resource_name = 'loadtest_sync_item'
+
+
+class SyncTest(ApiTestCase):
+    def setUp(self):
+        super(SyncTest, self).setUp()
+        self.user = self.create_user('sync')
+        request = self.fake_request(self.user)
+        self.category = LoadTestCategory(name='Sync').submit(request)
+        self.items = [LoadTestItem(name=name, info='<p>Hi</p>', category=self.category).submit(request)
+                      for name in ('First', 'Second', 'Third')]
+        self.ids = sorted(x.id for x in self.items)
+        self.set_change_time(self.ids, CHANGE_TIME)
+
+    def tearDown(self):
+        LoadTestItem.objects.filter(category=self.category).delete()
+
+    def set_change_time(self, ids, changed_time):
+        LoadTestItem.objects.filter(id__in=ids).update(submitted_time=changed_time, action_time=None)
+
+    def sync(self, cursor=None, limit=100):
+        params = {'cursor': cursor} if cursor else {'changed_since': CHANGED_SINCE}
+        params['limit'] = limit
+        return self.get_content(self.dispatch(SyncItemResource, 'list', params=params, user=self.user))
+
+    def test_pages_through_equal_change_times(self):
+        content = self.sync(limit=1)
+        ids = [x['id'] for x in content['objects']]
+        while content['meta']['has_more']:
+            self.assertTrue(content['meta']['next'])
+            content = self.sync(cursor=content['meta']['next_cursor'], limit=1)
+            self.assertTrue(len(content['objects']) <= 1)
+            ids += [x['id'] for x in content['objects']]
+        self.assertEqual(ids, self.ids) # Ordered by id, since the change times are the same
+
+    def test_removed_objects_get_tombstones(self):
+        removed = self.items[1]
+        removed.remove(self.fake_request(self.user))
+        LoadTestItem.objects.filter(id=removed.id).update(action_time=CHANGE_TIME + datetime.timedelta(minutes=1))
+
+        content = self.sync()
+        self.assertEqual([x['id'] for x in content['objects']], [x for x in self.ids if x != removed.id])
+        self.assertEqual(len(content['removed']), 1)
+        tombstone = content['removed'][0]
+        self.assertEqual(sorted(tombstone), ['id', 'resource_uri', 'time_last_updated'])
+        self.assertEqual(tombstone['id'], removed.id)
+        self.assertEqual(tombstone['resource_uri'],
+                         'https://api.example.com/loadtest/loadtest_sync_item/{0}/'.format(removed.id))
+
+    def test_hidden_objects_dont_get_tombstones(self):
+        LoadTestItem.objects.filter(id=self.items[0].id).update(name='Hidden')
+
+        content = self.sync()
+        self.assertEqual([x['id'] for x in content['objects']], [x for x in self.ids if x != self.items[0].id])
+        self.assertEqual(content['removed'], [])
+
+    def test_resumes_from_next_cursor(self):
+        content = self.sync()
+        self.assertFalse(content['meta']['has_more'])
+        self.assertEqual(content['meta']['next'], None)
+        cursor = content['meta']['next_cursor']
+
+        # Nothing changed, so the cursor stays where it was
+        content = self.sync(cursor=cursor)
+        self.assertEqual(content['objects'], [])
+        self.assertEqual(content['meta']['next_cursor'], cursor)
+
+        changed = self.items[0]
+        self.set_change_time([changed.id], CHANGE_TIME + datetime.timedelta(hours=1))
+        content = self.sync(cursor=cursor)
+        self.assertEqual([x['id'] for x in content['objects']], [changed.id])
+        self.assertNotEqual(content['meta']['next_cursor'], cursor)
+        self.assertEqual(self.sync(cursor=content['meta']['next_cursor'])['objects'], [])
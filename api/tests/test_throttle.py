@@ -0,0 +1,27 @@
+from __future__ import unicode_literals
+
+from api.tests.support import item_resource
+from api.tests.utils import ApiTestCase
+from api.throttle import TokenBucket
+
+
+CachedItemResource = item_resource(resource_name='loadtest_cached_item', cache_anonymous_lists=True,
+                                   rate_limit=TokenBucket(rate=0.001, capacity=2))
+
+
+class CachedListThrottleTest(ApiTestCase):
+    def get(self, address):
+        return self.dispatch(CachedItemResource, 'list', address=address)
+
+    def test_cached_responses_are_throttled(self):
+        first = self.get('10.0.0.1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['X-RateLimit-Remaining'], '1')
+
+        second = self.get('10.0.0.1')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['X-Api-Cache'], 'hit')
+        self.assertEqual(second['X-RateLimit-Remaining'], '0')
+
+        self.assertEqual(self.get('10.0.0.1').status_code, 429)
+        self.assertEqual(self.get('10.0.0.2').status_code, 200)
@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+import sys
+import types
+import unittest
+
+from django.conf import settings
+from django.conf.urls.defaults import include, patterns, url
+from tastypie import fields
+from tastypie.bundle import Bundle
+
+from api.resources.generic import BaseModelResource
+from api.router import ApiRouter
+from api.tests.support import LoadTestItem, item_resource
+
+
+class UriItemResource(BaseModelResource):
+    name = fields.CharField(attribute='name')
+
+    class Meta(BaseModelResource.Meta):
+        resource_name = 'loadtest_uri_item'
+        queryset = LoadTestItem.objects.all()
+        urlconf = str('api_uri_test_v1_urls')
+
+
+OtherUriItemResource = item_resource(UriItemResource, urlconf=str('api_uri_test_v2_urls'))
+
+
+def install_urlconf(name, prefix):
+    router = ApiRouter()
+    router.register(UriItemResource())
+    urlconf = types.ModuleType(name)
+    urlconf.urlpatterns = patterns('', url(r'^{0}/'.format(prefix), include(router.urls)))
+    sys.modules[name] = urlconf
+
+
+class ResourceUriTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        install_urlconf(UriItemResource.Meta.urlconf, 'v1')
+        install_urlconf(OtherUriItemResource.Meta.urlconf, 'v2')
+
+    def get_uri(self, resource_class, id):
+        return resource_class().get_resource_uri(Bundle(obj=LoadTestItem(id=id)))
+
+    def test_uris_are_paths(self):
+        self.assertEqual(self.get_uri(UriItemResource, 5), '/v1/loadtest_uri_item/5/')
+        self.assertEqual(self.get_uri(UriItemResource, 6), '/v1/loadtest_uri_item/6/')
+        self.assertEqual(UriItemResource().get_resource_list_uri(), '/v1/loadtest_uri_item/')
+
+    def test_templates_are_kept_per_urlconf(self):
+        self.assertEqual(self.get_uri(UriItemResource, 5), '/v1/loadtest_uri_item/5/')
+        self.assertEqual(self.get_uri(OtherUriItemResource, 5), '/v2/loadtest_uri_item/5/')
+
+    def test_host_is_added_when_formatted(self):
+        resource = UriItemResource()
+        base_api_url = settings.BASE_API_URL
+        try:
+            for host in ('https://api.example.com', 'https://api2.example.com'):
+                settings.BASE_API_URL = host
+                data = resource._format_api_uri(None, {'resource_uri': self.get_uri(UriItemResource, 5)}, [])
+                self.assertEqual(data['resource_uri'], '{0}/v1/loadtest_uri_item/5/'.format(host))
+        finally:
+            settings.BASE_API_URL = base_api_url
@@ -0,0 +1,41 @@
+from __future__ import unicode_literals
+
+from tastypie.bundle import Bundle
+from tastypie.exceptions import ImmediateHttpResponse
+
+from api.tests.support import item_resource
+from api.tests.utils import ApiTestCase, get_request
+
+
+MemoizedItemResource = item_resource(memoize_get_validation=True)
+
+
+class ValidationMemoTest(ApiTestCase):
+    def validate(self, params):
+        resource = MemoizedItemResource()
+        request = get_request('/loadtest/loadtest_item/', params)
+        resource.request = request
+        resource.request_type = 'list'
+        resource.method = 'GET'
+        bundle = Bundle(data=request.GET.copy())
+        resource.is_valid(bundle, request)
+        return bundle.data
+
+    def test_valid_query_is_remembered(self):
+        self.assertEqual(self.validate({'fields': '[id]'})['fields'], ['id'])
+        self.assertEqual(self.validate({'fields': '[id]'})['fields'], ['id'])
+
+    def test_similar_invalid_query_is_still_rejected(self):
+        self.validate({'fields': '[id]'})
+        try:
+            self.validate({'fields': '[id,]'})
+        except ImmediateHttpResponse, e:
+            self.assertEqual(e.response.status_code, 400)
+        else:
+            self.fail("[id,] was accepted because [id] was validated first")
+
+    def test_quoted_elements_are_validated_separately(self):
+        unquoted = self.validate({'fields': '[id,name]'})['fields']
+        quoted = self.validate({'fields': '[id,"name"]'})['fields']
+        self.assertEqual(unquoted, ['id', 'name'])
+        self.assertNotEqual(quoted, unquoted)
@@ -0,0 +1,119 @@
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import unittest
+
+import simplejson
+
+
+# The databases are files, rather than in memory, so every thread's connection sees the same data
+_database_dir = tempfile.mkdtemp(prefix='api_tests')
+
+TEST_SETTINGS = {
+    'DATABASES': {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(_database_dir, 'default.db')},
+                  'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(_database_dir, 'replica.db')}},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'INSTALLED_APPS': ['django.contrib.auth', 'django.contrib.contenttypes', 'django.contrib.sessions',
+                       'oauth2app', 'trackable_object'],
+    'MIDDLEWARE_CLASSES': ['django.contrib.sessions.middleware.SessionMiddleware',
+                           'django.contrib.auth.middleware.AuthenticationMiddleware'],
+    'BASE_API_URL': 'https://api.example.com',
+    'GET_LIMIT_MAX': 1000,
+    'DEBUG': False,
+}
+
+_ready = False
+
+
+def configure_settings():
+    """ Configures Django with TEST_SETTINGS, unless it is already configured (i.e. when
+        api.tests.support is imported by the api_loadtest command)
+    """
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(**TEST_SETTINGS)
+
+
+def setup_environment():
+    """ Creates the tables of every installed app and of the synthetic models in each database,
+        and serves the synthetic resources. Only runs once per process.
+    """
+    global _ready
+    if _ready:
+        return
+    from django.conf import settings
+    from django.core.management import call_command
+    from api.resources import generic
+    from api.tests.support import StubAuthenticator, create_synthetic_tables, install_urls
+
+    for alias in settings.DATABASES:
+        call_command('syncdb', interactive=False, verbosity=0, database=alias)
+        create_synthetic_tables(using=alias)
+    generic.Authenticator = StubAuthenticator
+    install_urls()
+    _ready = True
+
+
+def get_request(path='/', params=None, user=None, method='get', data=None):
+    """ Returns a request made with RequestFactory, with user (anonymous by default) set on it """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test.client import RequestFactory
+
+    factory = RequestFactory()
+    if method == 'get':
+        request = factory.get(path, params or {})
+    else:
+        request = getattr(factory, method)(path, data or '', content_type='application/json')
+    request.user = user or AnonymousUser()
+    return request
+
+
+class ApiTestCase(unittest.TestCase):
+    """ Sets up the test databases and the synthetic resources, and clears the API's cache
+        before each test
+    """
+    @classmethod
+    def setUpClass(cls):
+        setup_environment()
+
+    def setUp(self):
+        from api.cache import get_response_cache
+        get_response_cache().clear()
+
+    def create_user(self, username, **kwargs):
+        from django.contrib.auth.models import User
+        user, created = User.objects.get_or_create(username=username, defaults=dict(kwargs, email='{0}@example.com'.format(username)))
+        return user
+
+    def fake_request(self, user, method='POST'):
+        """ Returns a request to pass to TrackableObject's submit, edit and remove """
+        from trackable_object.utils import fake_request
+        return fake_request(user=user, content_type='application/json', data='{}', method=method)
+
+    def dispatch(self, resource, request_type, path='/loadtest/loadtest_item/', method='get', params=None,
+                 data=None, user=None, address=None, **kwargs):
+        """ Makes a request to a resource's view and returns the response, including error
+            responses. data is encoded as JSON. The request is made as user through the stub
+            access token, or anonymously.
+        """
+        from tastypie.exceptions import ImmediateHttpResponse
+        from api.tests.support import get_token
+
+        request = get_request(path, params=params, method=method,
+                              data=simplejson.dumps(data) if data is not None else None)
+        if user is not None:
+            request.META['HTTP_AUTHORIZATION'] = get_token(user.id)
+        if address is not None:
+            request.META['REMOTE_ADDR'] = address
+        if isinstance(resource, type):
+            resource = resource()
+        try:
+            return resource.dispatch(request_type, request, **kwargs)
+        except ImmediateHttpResponse, e:
+            return e.response
+
+    def get_content(self, response, status_code=200):
+        """ Checks the status code of a response and returns its decoded JSON """
+        self.assertEqual(response.status_code, status_code, response.content)
+        return simplejson.loads(response.content)
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+import Queue
+import sys
+import threading
+
+from django.db import connections
+
+
+def close_connections():
+    """ Closes this thread's database connections. Django opens one connection per thread,
+        so worker threads must close theirs before they exit.
+    """
+    for connection in connections.all():
+        connection.close()
+
+
+def thread_map(func, items, num_threads, make_state=None):
+    """ Calls func(state, item) for every item using a bounded number of threads and returns
+        the results in the same order as items.
+
+        Args:
+            func - the function to call for each item
+            items - a list of items
+            num_threads - the max number of threads to use
+            make_state - (optional) a function that is called once in each thread. Its return
+                         value is passed to func as state, so each thread can have objects
+                         that are not safe to share.
+
+        If func raises an exception, no new items are started and the first exception is
+        raised again in the calling thread.
+    """
+    results = [None] * len(items)
+    errors = []
+    queue = Queue.Queue()
+    for index in range(len(items)):
+        queue.put(index)
+
+    def worker():
+        try:
+            state = make_state() if make_state else None
+            while not errors:
+                try:
+                    index = queue.get_nowait()
+                except Queue.Empty:
+                    return
+                results[index] = func(state, items[index])
+        except Exception:
+            errors.append(sys.exc_info())
+        finally:
+            close_connections()
+
+    threads = [threading.Thread(target=worker) for i in range(min(num_threads, len(items)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        exc_type, exc_value, exc_traceback = errors[0]
+        raise exc_type, exc_value, exc_traceback
+    return results
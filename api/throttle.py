@@ -0,0 +1,77 @@
+from __future__ import unicode_literals
+
+import math
+import threading
+import time
+
+from django.core.cache import get_cache
+from django.http import HttpResponse
+
+
+class HttpTooManyRequests(HttpResponse):
+    status_code = 429
+
+
+class TokenBucket(object):
+    """ Limits how often each identity can do something with a token bucket per identity.
+
+        Each bucket holds up to capacity tokens and refills at rate tokens per second. Every
+        request takes a token, and a request that finds its bucket empty is throttled.
+
+        Usage (on a resource's Meta):
+            rate_limit = TokenBucket(rate=2, capacity=120) # Bursts of 120, then 2 per second
+
+        Buckets are kept in memory by each process, which is the fast path. If cache is the
+        alias of a Django cache, requests that pass the process's bucket are also checked
+        against a bucket in that cache that is shared by every process. The shared bucket is
+        read and written without a lock, so concurrent requests can occasionally get through
+        after it is empty.
+    """
+    max_local_buckets = 10000 # Full buckets are dropped when there are more than this many
+
+    def __init__(self, rate, capacity, cache=None):
+        self.rate = float(rate)
+        self.capacity = capacity
+        self.cache = cache
+        self._buckets = {} # Maps each key to a (tokens, time) tuple
+        self._lock = threading.Lock()
+
+    def consume(self, key, now=None):
+        """ Takes a token from the bucket for key.
+
+            Returns a tuple of whether the request is allowed, the number of tokens left and
+            the number of seconds until the next token is available.
+        """
+        now = now or time.time()
+        with self._lock:
+            if len(self._buckets) > self.max_local_buckets:
+                self._drop_full_buckets(now)
+            allowed, tokens = self._take(self._buckets.get(key), now)
+            self._buckets[key] = (tokens, now)
+
+        if allowed and self.cache:
+            cache = get_cache(self.cache)
+            cache_key = 'api:throttle:{0}'.format(key)
+            allowed, tokens = self._take(cache.get(cache_key), now)
+            cache.set(cache_key, (tokens, now), int(math.ceil(self.capacity / self.rate)) + 1)
+
+        retry_after = 0 if tokens >= 1 else (1 - tokens) / self.rate
+        return allowed, int(tokens), retry_after
+
+    def _take(self, bucket, now):
+        """ Refills bucket, a (tokens, time) tuple or None for a new bucket, and takes a token
+            from it if there is one. Returns whether it had a token and the tokens left.
+        """
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, last_time = bucket
+            tokens = min(self.capacity, tokens + (now - last_time) * self.rate)
+        if tokens >= 1:
+            return True, tokens - 1
+        return False, tokens
+
+    def _drop_full_buckets(self, now):
+        for key, (tokens, last_time) in self._buckets.items():
+            if tokens + (now - last_time) * self.rate >= self.capacity:
+                del self._buckets[key]
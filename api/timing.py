@@ -0,0 +1,155 @@
+from __future__ import unicode_literals
+
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from api.queries import QUERY_DEBUG_HEADER, add_query_headers, get_query_log
+
+
+# Staff users can ask for timings on a single request by sending this header
+SERVER_TIMING_HEADER = 'HTTP_X_SERVER_TIMING'
+
+
+class _NullPhase(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+_null_phase = _NullPhase()
+
+
+class NullTimer(object):
+    """ Used in place of a RequestTimer when timing is turned off. Every hook is a no-op
+        so instrumented code pays for little more than an attribute lookup.
+    """
+    enabled = False
+
+    def phase(self, name):
+        return _null_phase
+
+    def add_header(self, request, response, object_count=None):
+        return response
+
+    def stop(self):
+        pass
+
+null_timer = NullTimer()
+
+
+class _Phase(object):
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        query_log = self.timer.query_log
+        self.start_count = query_log.count if query_log is not None else 0
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        query_log = self.timer.query_log
+        query_count = query_log.count - self.start_count if query_log is not None else 0
+        self.timer.record(self.name, time.time() - self.start, query_count)
+        return False
+
+
+class RequestTimer(object):
+    """ Records how long each phase of a request takes and reports it in a Server-Timing header.
+
+        Usage:
+            with timer.phase('query'):
+                objects = list(queryset)
+
+        Phases with the same name are added together. If a QueryLog is given, the number
+        of queries run in each phase is recorded as well.
+    """
+    enabled = True
+
+    def __init__(self, staff_only=False, report_timing=True, query_log=None):
+        """ Args:
+                staff_only - If True, the header is only added if the authenticated user is staff
+                report_timing - If False, only the query counts are reported
+                query_log - (optional) an active QueryLog to count queries per phase with
+        """
+        self.staff_only = staff_only
+        self.report_timing = report_timing
+        self.query_log = query_log
+        self.start = time.time()
+        self.names = []
+        self.durations = {}
+        self.query_counts = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def record(self, name, duration, query_count=0):
+        if name not in self.durations:
+            self.names.append(name)
+            self.durations[name] = 0
+            self.query_counts[name] = 0
+        self.durations[name] += duration
+        self.query_counts[name] += query_count
+
+    def header_value(self):
+        """ Returns the timings in the Server-Timing header format, in milliseconds """
+        timings = [(name, self.durations[name]) for name in self.names]
+        timings.append(('total', time.time() - self.start))
+        return ', '.join(['{0};dur={1:.2f}'.format(name, duration * 1000) for name, duration in timings])
+
+    def add_header(self, request, response, object_count=None):
+        """ Adds the Server-Timing header to the response if the user is allowed to see it.
+
+            Args:
+                object_count - (optional) the number of objects in the response, used to
+                               spot queries that are repeated for every object
+        """
+        if self.query_log is not None:
+            phase_counts = [(name, self.query_counts[name]) for name in self.names]
+            response = add_query_headers(request, response, self.query_log, phase_counts, object_count)
+        if not self.report_timing or self.staff_only and not getattr(request.user, 'is_staff', False):
+            return response
+        response['Server-Timing'] = self.header_value()
+        return response
+
+    def stop(self):
+        """ Stops counting queries. Safe to call more than once. """
+        if self.query_log is not None:
+            self.query_log.stop()
+
+
+def get_timer(request, using=DEFAULT_DB_ALIAS):
+    """ Returns a RequestTimer if timing is enabled for this request and a NullTimer otherwise.
+
+        Timing is enabled for every request with settings.API_SERVER_TIMING, or for a
+        single request made by a staff user that sends an X-Server-Timing header.
+        A RequestTimer is also returned to count queries per phase, in the databases in using,
+        if query debugging is on.
+    """
+    query_log = get_query_log(request, using)
+    if getattr(settings, 'API_SERVER_TIMING', False):
+        return RequestTimer(query_log=query_log)
+    if SERVER_TIMING_HEADER in request.META:
+        return RequestTimer(staff_only=True, query_log=query_log)
+    if query_log is not None:
+        return RequestTimer(report_timing=False, query_log=query_log)
+    return null_timer
+
+
+def get_authenticated_timer(timer, request, using=DEFAULT_DB_ALIAS):
+    """ Returns the timer to use once request.user is authenticated. If the user is staff and
+        sent an X-Query-Debug header, but queries aren't being counted yet (i.e. they were
+        authenticated with OAuth), queries are counted from here on.
+    """
+    if getattr(timer, 'query_log', None) is not None or QUERY_DEBUG_HEADER not in request.META or \
+       not getattr(request.user, 'is_staff', False):
+        return timer
+    query_log = get_query_log(request, using)
+    if timer.enabled:
+        timer.query_log = query_log
+        return timer
+    return RequestTimer(report_timing=False, query_log=query_log)
@@ -7,7 +7,9 @@ import pytz
 
 from BeautifulSoup import BeautifulSoup
 
+from api.pool import pooled_resource
 from api.resources.generic import BaseModelResource
+from api.serializers import COLUMNAR_LAYOUT
 from trackable_object.models import TrackableObject
 from trackable_object.utils import fake_request
 
@@ -34,7 +36,7 @@ def get_resource_class(model):
         return None
 
 
-def access_resource(resource_class, request, obj=None, method='GET', type='list', resource_ids=None, params=None, full=True, return_obj=False):
+def access_resource(resource_class, request, obj=None, method='GET', type='list', resource_ids=None, params=None, full=True, return_obj=False, columnar=False):
     """ Access one or more resources. Resources are returned as Python dicts.
 
         Args:
@@ -55,9 +57,14 @@ def access_resource(resource_class, request, obj=None, method='GET', type='list'
                    If False, the GET detail call will return only a partially hydrated dict
             return_obj - If True, it returns the django object(s). (does not yet work with GET detail)
                          If False, it returns a dictionary equal to the JSON that the API usually returns
+            columnar - If True, GET list returns the objects in the columnar layout, i.e.
+                       {'meta': {...}, 'columns': [...], 'rows': [[...], ...]}.
+                       Use api.serializers.from_columnar to turn it back into a list of dicts.
     """
-    if not params:
-        params = {}
+    params = dict(params or {}) # Don't change the caller's dict
+
+    if columnar:
+        params['layout'] = COLUMNAR_LAYOUT
 
     # Turn all lists from the parameter dict into strings
     for key, value in params.items():
@@ -65,6 +72,57 @@ def access_resource(resource_class, request, obj=None, method='GET', type='list'
             value = [str(x) for x in value]
             params[key] = "[{0}]".format(','.join(value))
 
+    resource_class = _resolve_resource_class(resource_class)
+
+    # Set the right content type. GETdoesn't use JSON, it just encodes the parameters into the URL
+    if method == 'GET':
+        content_type = 'application/x-www-form-urlencoded'
+    else:
+        content_type = 'application/json'
+
+    with pooled_resource(resource_class) as resource:
+        return _access_pooled_resource(resource, request, content_type, obj=obj, method=method, type=type,
+                                       resource_ids=resource_ids, params=params, full=full, return_obj=return_obj)
+
+
+def export_resource(resource_class, request, stream, params=None, after_pk=None, chunk_size=None):
+    """ Writes every object in a resource's list that the user can see to a stream or file, one
+        JSON object per line, in primary key order. Objects are fetched and written in chunks,
+        so the whole list is never kept in memory.
+
+        Args:
+            resource_class - anything that access_resource accepts as a resource_class
+            request - the request that was originally made by the user
+            stream - a file-like object, or the path of a file. The file is appended to if
+                     after_pk is given, so an export can be resumed in the same file.
+            params - (optional) A Dict of the filters to use, like the ones for access_resource.
+                     limit and offset are ignored.
+            after_pk - (optional) Only export objects whose pk is greater than this. To resume an
+                       interrupted export, pass the id on the last line that was written.
+            chunk_size - (optional) The number of objects fetched per query. Defaults to the
+                         resource's Meta.export_chunk_size
+
+        Returns the pk of the last object written, or after_pk if nothing was written.
+    """
+    params = dict(params or {})
+    for key, value in params.items():
+        if isinstance(value, list):
+            params[key] = "[{0}]".format(','.join([str(x) for x in value]))
+
+    if isinstance(stream, basestring):
+        with open(stream, 'a' if after_pk is not None else 'w') as f:
+            return export_resource(resource_class, request, f, params=params, after_pk=after_pk, chunk_size=chunk_size)
+
+    resource_class = _resolve_resource_class(resource_class)
+    with pooled_resource(resource_class) as resource:
+        resource.locally_accessed = True
+        fake = fake_request(user=request.user, content_type='application/x-www-form-urlencoded', data=simplejson.dumps(params), method='GET')
+        fake.method = 'get'
+        return resource.export_ndjson(fake, stream, after_pk=after_pk, chunk_size=chunk_size)
+
+
+def _resolve_resource_class(resource_class):
+    """ Returns the resource class for a resource class, a resource name or a model class """
     if isinstance(resource_class, basestring):
         resource_class_string = resource_class
         resource_class = None
@@ -79,15 +137,15 @@ def access_resource(resource_class, request, obj=None, method='GET', type='list'
     elif issubclass(resource_class, TrackableObject): 
         # This is a Model class and we need to fetch the appropriate resource class
         resource_class = get_resource_class(resource_class)
+    return resource_class
 
-    # Set the right content type. GETdoesn't use JSON, it just encodes the parameters into the URL
-    if method == 'GET':
-        content_type = 'application/x-www-form-urlencoded'
-    else:
-        content_type = 'application/json'
 
-    resource = resource_class()
+def _access_pooled_resource(resource, request, content_type, obj=None, method='GET', type='list', resource_ids=None, params=None, full=True, return_obj=False):
+    """ Does the work for access_resource once it has an instance of the resource to use """
     resource.locally_accessed = True
+    # Every call gets a new request, even though the resource is reused. Requests keep
+    # per-call state (the parsed GET and POST data, the user is_authenticated sets and
+    # replicas' _api_recently_wrote), which a reused request would carry into the next call.
     resource.request = fake_request(user=request.user, content_type=content_type, data=simplejson.dumps(params), method=method)
 
     # Set the right method to use
@@ -154,6 +212,78 @@ def access_resource(resource_class, request, obj=None, method='GET', type='list'
             raise NotImplementedError
 
 
+class RenderedResourceList(object):
+    """ A list of resources that is rendered with access_resource one window at a time.
+
+        Pass it to a RenderedResourcePaginator in place of the dict returned by access_resource
+        so server rendered pages only fetch the objects on the page being shown:
+
+            objects = RenderedResourceList('jobs', request, params={'order_by': ['-id']})
+            paginator = RenderedResourcePaginator(objects, 20)
+
+        Args:
+            resource_class - anything that access_resource accepts as a resource_class
+            request - the request that was originally made by the user
+            params - (optional) A Dict of args being used for the API call. offset and limit
+                     are set for each window.
+            full - passed through to access_resource
+    """
+    def __init__(self, resource_class, request, params=None, full=True):
+        self.resource_class = resource_class
+        self.request = request
+        self.params = params or {}
+        self.full = full
+        self._meta = None
+        self._windows = [] # A list of (offset, objects) tuples that have been fetched
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            return self._get_range(start, stop)[::step]
+        objects = self._get_range(key, key + 1)
+        if not objects:
+            raise IndexError("RenderedResourceList index out of range")
+        return objects[0]
+
+    def __len__(self):
+        return self.meta.get('total_count')
+
+    def get(self, key, default=None):
+        """ Lets code written for the dict returned by access_resource read 'meta' and 'objects' """
+        if key == 'meta':
+            return self.meta
+        elif key == 'objects':
+            return self
+        return default
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            self.fetch_window(0, 1)
+        return self._meta
+
+    def fetch_window(self, offset, limit):
+        """ Renders limit objects starting at offset with a single access_resource call """
+        params = dict(self.params)
+        params['offset'] = offset
+        params['limit'] = limit
+        data = access_resource(self.resource_class, self.request, params=params, full=self.full)
+        self._meta = data.get('meta')
+        objects = data.get('objects', [])
+        self._windows.append((offset, objects))
+        return objects
+
+    def _get_range(self, start, stop):
+        """ Returns the objects from start to stop, fetching them if no window covers the range """
+        if stop <= start:
+            return []
+        for offset, objects in self._windows:
+            if offset <= start and (stop <= offset + len(objects) or offset + len(objects) >= len(self)):
+                return objects[start - offset:stop - offset]
+        objects = self.fetch_window(start, stop - start)
+        return objects
+
+
 def isoformat(dt):
     """ Takes a datetime stored returns the time in an isoformat, accounting
         for daylight savings time. 